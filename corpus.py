@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+    corpus.py
+
+On-disk cache of generated testcases (arguments and expected returns),
+keyed by a hash of the generator parameters and the sources of the generator and reference functions.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import typing
+
+from generation import generate_testcases
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+DEFAULT_CACHE_DIR = '.testcase_cache'
+_MANIFEST_FILENAME = 'manifest.json'
+
+class _NpyRef(typing.NamedTuple):
+    """
+    Placeholder for a NumPy array stored in a separate .npy file, which is memory-mapped when loaded.
+    Other values, including lists of numbers, are pickled with the testcase and fully loaded into memory.
+    """
+    filename: str
+
+def _func_source(func: typing.Callable) -> str:
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return f'{getattr(func, "__module__", "")}.{getattr(func, "__qualname__", repr(func))}'
+
+def corpus_key(generate_testcase: typing.Callable, ref_func: typing.Callable, n_testcases: int, initial_seed: int, **generation_params) -> str:
+    """
+    Returns: A hex digest identifying a corpus; it changes if any of the parameters or the source of either function changes.
+    """
+    key = json.dumps({
+        'generate_testcase': _func_source(generate_testcase),
+        'ref_func': _func_source(ref_func),
+        'n_testcases': n_testcases,
+        'initial_seed': initial_seed,
+        'generation_params': {name: repr(value) for name, value in sorted(generation_params.items())},
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _is_ndarray(value: typing.Any) -> bool:
+    return (numpy is not None) and isinstance(value, numpy.ndarray)
+
+def save_testcase(corpus_dir: str, index: int, testcase: tuple[tuple, typing.Any]) -> None:
+    """
+    Saves a testcase of (arguments, expected return). NumPy arrays among the arguments and the expected return are stored as .npy files;
+    anything else (e.g. a list) is pickled as is, so that it is loaded as the same type.
+    """
+    def externalize(value, name):
+        if not _is_ndarray(value):
+            return value
+        filename = f'{index:08d}.{name}.npy'
+        temp_path = os.path.join(corpus_dir, f'{filename}.{os.getpid()}.tmp.npy')
+        numpy.save(temp_path, value, allow_pickle=False)
+        os.replace(temp_path, os.path.join(corpus_dir, filename))
+        return _NpyRef(filename)
+
+    args, expected = testcase
+    stored = (tuple(externalize(arg, f'arg{i}') for i, arg in enumerate(args)), externalize(expected, 'expected'))
+    _write_atomic(os.path.join(corpus_dir, f'{index:08d}.pkl'), pickle.dumps(stored, protocol=pickle.HIGHEST_PROTOCOL))
+
+def load_testcase(corpus_dir: str, index: int) -> tuple[tuple, typing.Any]:
+    """
+    Loads a testcase saved by save_testcase(). NumPy arrays are memory-mapped copy-on-write, so they are read from disk only when accessed,
+    and functions may modify them in place (e.g. sort) without changing the corpus.
+    """
+    def internalize(value):
+        if isinstance(value, _NpyRef):
+            return numpy.load(os.path.join(corpus_dir, value.filename), mmap_mode='c')
+        return value
+
+    with open(os.path.join(corpus_dir, f'{index:08d}.pkl'), 'rb') as f:
+        args, expected = pickle.load(f)
+    return tuple(internalize(arg) for arg in args), internalize(expected)
+
+def cached_testcases(generate_testcase: typing.Callable[..., tuple], ref_func: typing.Callable, n_testcases: int, initial_seed: int, cache_dir: str = DEFAULT_CACHE_DIR, workers: typing.Optional[int | typing.Any] = None, **generation_params) -> typing.Iterator[tuple[tuple, typing.Any]]:
+    """
+    Same as generation.generate_testcases(), but testcases are loaded from :cache_dir: if a complete corpus with the same key (see corpus_key()) exists.
+    Otherwise testcases are generated and saved as they are yielded; the corpus is marked complete once all of them are saved.
+
+    Testcases are loaded one by one as they are consumed, so tests.time_funcs_testcases() starts timing the first testcase right away.
+    """
+    if n_testcases <= 0:
+        return
+
+    key = corpus_key(generate_testcase, ref_func, n_testcases, initial_seed, **generation_params)
+    corpus_dir = os.path.join(cache_dir, key)
+    manifest_path = os.path.join(corpus_dir, _MANIFEST_FILENAME)
+
+    if os.path.exists(manifest_path):
+        for index in range(n_testcases):
+            yield load_testcase(corpus_dir, index)
+        return
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    for index, testcase in enumerate(generate_testcases(generate_testcase, ref_func, n_testcases, initial_seed, workers=workers, **generation_params)):
+        save_testcase(corpus_dir, index, testcase)
+        yield testcase
+
+    manifest = dict(
+        key=key,
+        n_testcases=n_testcases,
+        initial_seed=initial_seed,
+        generate_testcase=f'{generate_testcase.__module__}.{generate_testcase.__qualname__}',
+        ref_func=f'{ref_func.__module__}.{ref_func.__qualname__}',
+        generation_params={name: repr(value) for name, value in generation_params.items()},
+    )
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
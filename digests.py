@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+    digests.py
+
+Digests of expected returns, so that testcases need not keep large expected values in memory.
+A value is hashed incrementally in a canonical encoding, in which values equal by == (and NumPy arrays equal to nested lists) encode the same,
+except sequences: lists, tuples, array.arrays and memoryviews all encode as lists of their elements, the same as tests.values_equal() compares them with NumPy arrays.
+"""
+from __future__ import annotations
+
+import array
+import dataclasses
+import decimal
+import fractions
+import hashlib
+import numbers
+import sys
+import typing
+
+from strs import fitlength
+from iterable import get_dims
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Number of elements of a sequence encoded per hash update
+_CHUNK_LENGTH = 4096
+
+def _int_code(value: int) -> bytes:
+    # hex() is not limited by sys.get_int_max_str_digits().
+    return b'i%s;' % hex(value).encode()
+
+def _float_code(value: float) -> bytes:
+    # 1.0 == 1, so integral floats are encoded as ints.
+    if value.is_integer():
+        return _int_code(int(value))
+    return b'f%r;' % value
+
+def _rational_code(value: numbers.Rational) -> bytes:
+    return b'r%s/%s;' % (hex(value.numerator).encode(), hex(value.denominator).encode())
+
+def _complex_code(value: complex) -> bytes:
+    return b'c%s%s' % (_float_code(value.real), _float_code(value.imag))
+
+def _str_code(value: str) -> bytes:
+    encoded = value.encode('utf-8', 'surrogatepass')
+    return b's%d:%s' % (len(encoded), encoded)
+
+def _bytes_code(value: bytes) -> bytes:
+    return b'b%d:%s' % (len(value), value)
+
+# {type: encoder} of scalars
+_SCALAR_CODES = {
+    int: _int_code,
+    bool: _int_code,
+    float: _float_code,
+    str: _str_code,
+    bytes: _bytes_code,
+    bytearray: _bytes_code,
+    type(None): lambda value: b'n;',
+}
+
+def _normalized_number(value: typing.Any) -> typing.Any:
+    """
+    Returns: :value: as an int or a float if it is a number equal to one (e.g. numpy.int32(1), Decimal(1), Fraction(1, 2) or complex(1, 0)),
+        a Fraction if it is any other finite Decimal, otherwise :value: as is.
+    """
+    if (numpy is not None) and isinstance(value, numpy.generic):
+        value = value.item()
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, numbers.Complex) and not isinstance(value, numbers.Real):
+        if value.imag != 0:
+            return value
+        value = value.real
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            return float(value)
+        value = fractions.Fraction(value)
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Rational):
+        numerator, denominator = value.numerator, value.denominator
+        if denominator == 1:
+            return int(numerator)
+        # Floats are the rationals of which denominators are powers of 2, within range.
+        if denominator & (denominator - 1) == 0:
+            try:
+                as_float = numerator / denominator
+            except OverflowError:
+                return value
+            if as_float.as_integer_ratio() == (numerator, denominator):
+                return as_float
+    return value
+
+def _scalar_code(value: typing.Any) -> typing.Optional[bytes]:
+    """
+    Returns: The encoding of :value: if it is a scalar, otherwise None.
+    """
+    code = _SCALAR_CODES.get(type(value))
+    if code is not None:
+        return code(value)
+    value = _normalized_number(value)
+    code = _SCALAR_CODES.get(type(value))
+    if code is not None:
+        return code(value)
+    if isinstance(value, float):
+        return _float_code(float(value))
+    if isinstance(value, numbers.Rational):
+        return _rational_code(value)
+    if isinstance(value, numbers.Complex):
+        return _complex_code(complex(value))
+    return None
+
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+
+def _run_code(kind: str, run: typing.Sequence) -> bytes:
+    """
+    Returns: The encoding of a run of ints in the int64 range (:kind: 'q') or non-integral floats (:kind: 'd'), as little-endian binary.
+    """
+    buffer = array.array(kind, run)
+    if sys.byteorder == 'big':
+        buffer.byteswap()
+    return b'%s%d:%s' % (kind.encode(), len(buffer), buffer.tobytes())
+
+def _element_kind(value: typing.Any) -> tuple[typing.Optional[str], typing.Any]:
+    """
+    Returns: A tuple of (kind of run, value normalized for the run), where kind is None if :value: is not encoded in runs.
+    """
+    value = _normalized_number(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, float):
+        return 'd', float(value)
+    if isinstance(value, numbers.Integral) and (_INT64_MIN <= value <= _INT64_MAX):
+        return 'q', int(value)
+    return None, value
+
+def _feed_elements(hasher, elements: typing.Sequence) -> None:
+    """
+    Encodes :elements: in order, a chunk at a time.
+    In each chunk, maximal runs of ints in the int64 range and of non-integral floats are encoded in binary (see _run_code()),
+    so that chunks of only ints or only floats (and chunks of NumPy arrays in _feed_ndarray()) are encoded without a loop in Python.
+    """
+    for start in range(0, len(elements), _CHUNK_LENGTH):
+        chunk = elements[start:start + _CHUNK_LENGTH]
+        types = set(map(type, chunk))
+        if types == {int}:
+            try:
+                hasher.update(_run_code('q', chunk))
+                continue
+            except OverflowError:
+                pass
+        elif (types == {float}) and not any(map(float.is_integer, chunk)):
+            hasher.update(_run_code('d', chunk))
+            continue
+
+        run_kind, run = None, []
+        for element in chunk:
+            kind, element = _element_kind(element)
+            if (kind != run_kind) and (len(run) > 0):
+                hasher.update(_run_code(run_kind, run))
+                run.clear()
+            run_kind = kind
+            if kind is not None:
+                run.append(element)
+            else:
+                _feed(hasher, element)
+        if len(run) > 0:
+            hasher.update(_run_code(run_kind, run))
+
+def _feed_ndarray(hasher, value) -> None:
+    """
+    Encodes a NumPy array the same as the nested lists of value.tolist(), a chunk of elements at a time.
+    """
+    if value.ndim == 0:
+        _feed(hasher, value.item())
+        return
+    if (len(value) == 0) and (value.ndim > 1):
+        # No nested list is equal to an empty array of more than one dimension (e.g. of shape (0, 3)) by tests.values_equal().
+        hasher.update(b'a%s;' % ','.join(map(str, value.shape)).encode())
+        return
+
+    hasher.update(b'l%d:' % len(value))
+    if value.ndim > 1:
+        for row in value:
+            _feed_ndarray(hasher, row)
+        return
+
+    is_int64 = (value.dtype.kind == 'i') or ((value.dtype.kind == 'u') and (value.dtype.itemsize < 8))
+    for start in range(0, len(value), _CHUNK_LENGTH):
+        chunk = value[start:start + _CHUNK_LENGTH]
+        if is_int64:
+            hasher.update(b'q%d:%s' % (len(chunk), chunk.astype('<i8').tobytes()))
+        elif (value.dtype.kind == 'f') and not numpy.any(numpy.isfinite(chunk) & (chunk == numpy.floor(chunk))):
+            hasher.update(b'd%d:%s' % (len(chunk), chunk.astype('<f8').tobytes()))
+        else:
+            _feed_elements(hasher, chunk.tolist())
+
+def _unordered_digests(values: typing.Iterable) -> bytes:
+    return b''.join(sorted(value_digest(value) for value in values))
+
+def _feed(hasher, value: typing.Any) -> None:
+    code = _scalar_code(value)
+    if code is not None:
+        hasher.update(code)
+    elif (numpy is not None) and isinstance(value, numpy.ndarray):
+        _feed_ndarray(hasher, value)
+    elif (numpy is not None) and isinstance(value, memoryview) and (value.ndim > 1):
+        _feed_ndarray(hasher, numpy.asarray(value))
+    elif isinstance(value, (list, tuple, array.array, memoryview)):
+        # Sequences equal to lists or to NumPy arrays by values_equal() encode as lists.
+        hasher.update(b'l%d:' % len(value))
+        if not isinstance(value, memoryview):
+            _feed_elements(hasher, value)
+        elif value.ndim > 1:
+            _feed_elements(hasher, value.tolist())
+        else:
+            for start in range(0, len(value), _CHUNK_LENGTH):
+                _feed_elements(hasher, value[start:start + _CHUNK_LENGTH].tolist())
+    elif isinstance(value, dict):
+        # Equality of dicts and sets does not depend on order, so digests of items are sorted.
+        hasher.update(b'd%d:' % len(value))
+        hasher.update(_unordered_digests(value.items()))
+    elif isinstance(value, (set, frozenset)):
+        hasher.update(b'e%d:' % len(value))
+        hasher.update(_unordered_digests(value))
+    else:
+        hasher.update(_str_code(f'{type(value).__module__}.{type(value).__qualname__}:{value!r}'))
+
+def value_digest(value: typing.Any) -> bytes:
+    """
+    Returns: A 16-byte BLAKE2b digest of the canonical encoding of :value:, computed incrementally.
+        Values equal by == have the same digest, including numbers of different types (e.g. 1, 1.0, Decimal(1), Fraction(1) and complex(1, 0))
+        and bytes-like bytes and bytearray, and so do NumPy arrays, array.arrays and memoryviews equal to nested lists by tests.values_equal().
+        Tuples are encoded as lists, so a tuple has the same digest as a list or a NumPy array of equal elements, although (1, 2) != [1, 2].
+        A memoryview is encoded as a list of its elements even if it is of bytes, so it does not have the same digest as bytes equal to it.
+        Objects of other types are encoded by their repr().
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    _feed(hasher, value)
+    return hasher.digest()
+
+@dataclasses.dataclass(frozen=True)
+class ValueDigest:
+    """
+    Stands for an expected return in a testcase, keeping only its digest and a short preview for display.
+    """
+    digest: bytes
+    preview: str
+    dims: tuple[int, ...] = ()
+
+    @classmethod
+    def of(cls, value: typing.Any, preview_maxlen: int = 200) -> ValueDigest:
+        return cls(value_digest(value), fitlength(value, maxlen=preview_maxlen), tuple(get_dims(value)))
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """
+        Dimensions of the digested value, read by iterable.get_dims().
+        """
+        return self.dims
+
+    def matches(self, value: typing.Any) -> bool:
+        return value_digest(value) == self.digest
+
+    def __str__(self):
+        return self.preview
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+    generation.py
+
+Deterministic, parallel, streaming generation of random testcases.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import random
+import typing
+
+from pools import pool_context, pool_window, submitted_ahead
+
+
+def derive_seed(initial_seed: int, index: int) -> int:
+    """
+    Returns: A 64-bit seed for the :index:-th testcase, derived from :initial_seed: only,
+        so that a testcase is the same whichever worker generates it and in whichever order.
+    """
+    return int.from_bytes(hashlib.blake2b(f'{initial_seed}:{index}'.encode(), digest_size=8).digest(), 'little')
+
+def generate_testcase_at(generate_testcase: typing.Callable[..., tuple], ref_func: typing.Callable, initial_seed: int, index: int, **generation_params) -> tuple[tuple, typing.Any]:
+    """
+    Generates the :index:-th testcase.
+
+    Returns: A tuple of (arguments, expected return by :ref_func:).
+    """
+    args = generate_testcase(random.Random(derive_seed(initial_seed, index)), **generation_params)
+    return args, ref_func(*args)
+
+def generate_testcases(generate_testcase: typing.Callable[..., tuple], ref_func: typing.Callable, n_testcases: int, initial_seed: int, workers: typing.Optional[int | typing.Any] = None, window: typing.Optional[int] = None, **generation_params) -> typing.Iterator[tuple[tuple, typing.Any]]:
+    """
+    Generates testcases lazily, in the order of their indices.
+
+    Args:
+        generate_testcase: A function called as generate_testcase(rng, **:generation_params:), returning a tuple of arguments.
+            rng is a random.Random seeded by derive_seed(:initial_seed:, index); it must be the only source of randomness,
+            so that testcases are identical regardless of :workers:.
+        ref_func: A function computing expected returns.
+        workers: If given, testcases are generated (including :ref_func: calls) in a process pool.
+            Either a number of workers (see pools.process_pool()) or an executor.
+            :generate_testcase:, :ref_func: and :generation_params: must be picklable.
+            Workers are pinned to cores not used by other pools (see pools.process_pool()), but still compete with timing in this process
+            while testcases are consumed by tests.time_funcs_testcases() without workers.
+        window: Number of testcases generated ahead of the one consumed.
+            Defaults to 4 per worker of the pool created for :workers:, or 4 per CPU for an executor given.
+
+    Yields: Tuples of (arguments, expected return), which tests.time_funcs_testcases() and tests.run_funcs_testcases() accept.
+    """
+    generate = functools.partial(generate_testcase_at, generate_testcase, ref_func, initial_seed, **generation_params)
+    if workers is None:
+        for index in range(n_testcases):
+            yield generate(index)
+        return
+
+    with pool_context(workers) as pool:
+        if window is None:
+            window = 4 * pool_window(pool)
+        for _, future in submitted_ahead(range(n_testcases), lambda index: pool.submit(generate, index), window):
+            yield future.result()
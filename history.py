@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+    history.py
+
+Persistent benchmark history: runs of tests.time_funcs_testcases() are appended to a JSON-lines file,
+and a run can be compared to a baseline run with the Mann-Whitney U test to flag significant regressions and improvements.
+
+Usage:
+    python history.py list
+    python history.py compare [RUN] [--baseline RUN] [--alpha 0.05] [--min-change 0.0]
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import datetime
+import enum
+import functools
+import json
+import os
+import platform
+import typing
+import uuid
+
+import colorama
+
+from strs import colorize
+from tests import python_implemntation_text, gil_enabled
+from timer import ExecTimes
+import human_friendly
+import stats
+
+
+DEFAULT_HISTORY_PATH = 'benchmark_history.jsonl'
+
+def host_metadata() -> dict[str, typing.Any]:
+    return dict(
+        hostname=platform.node(),
+        system=platform.system(),
+        release=platform.release(),
+        machine=platform.machine(),
+        processor=platform.processor(),
+        cpu_count=os.cpu_count(),
+    )
+
+def func_name(func: typing.Callable) -> str:
+    func = func.func if isinstance(func, functools.partial) else func
+    return f'{func.__module__}.{func.__qualname__}'
+
+class BenchmarkHistory:
+    """
+    Runs stored in a JSON-lines file, one run per line, in the order recorded.
+
+    A run is a dict of run_id, label, timestamp, python (tests.python_implemntation_text()), gil, host (see host_metadata()),
+    and results: a list of dicts of testcase (index), testcase_key, func, repeats, rank_by, batch_size and samples (elapsed_ns and calls of each sample).
+    """
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, label: typing.Optional[str] = None):
+        """
+        Args:
+            label: A label of runs recorded, e.g. a commit or a branch name, by which runs can be looked up.
+        """
+        self.path = path
+        self.label = label
+
+    def record(self, results: list[tuple[int, ExecTimes]], testcase_keys: typing.Optional[dict[int, str]] = None) -> dict:
+        """
+        Appends a run of :results: returned by tests.time_funcs_testcases().
+
+        Args:
+            testcase_keys: {testcase index: key identifying the testcase, e.g. a digest of its arguments}.
+                Results are matched by keys (or by indices if not given) on comparison.
+
+        Returns: The run recorded.
+        """
+        run = dict(
+            run_id=uuid.uuid4().hex[:12],
+            label=self.label,
+            timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            python=python_implemntation_text(),
+            gil=gil_enabled(),
+            host=host_metadata(),
+            results=[
+                dict(
+                    testcase=testcase_index,
+                    testcase_key=(testcase_keys or {}).get(testcase_index, str(testcase_index)),
+                    func=func_name(func),
+                    repeats=times._repeats,
+                    rank_by=times._rank_by,
+                    batch_size=times._batch_sizes.get(func, 1),
+                    samples=dict(elapsed_ns=list(times.samples(func)._elapsed_ns), calls=list(times.samples(func)._calls)),
+                )
+                for testcase_index, times in results for func in times._times
+            ],
+        )
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run) + '\n')
+        return run
+
+    def runs(self) -> list[dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def find_run(self, run: typing.Optional[str] = None) -> dict:
+        """
+        Returns: The latest run of which ID starts with :run: or of which label is :run:, or the latest run if :run: is None.
+        Raises: KeyError if there is no such run.
+        """
+        matching = [r for r in self.runs() if (run is None) or r['run_id'].startswith(run) or (r['label'] == run)]
+        if len(matching) == 0:
+            raise KeyError(f'No run {run if run is not None else ""} in {self.path}')
+        return matching[-1]
+
+Verdict = enum.Enum('Verdict', ['Regression', 'Improvement', 'NoChange'])
+
+@dataclasses.dataclass(frozen=True)
+class RunComparison:
+    """
+    Comparison of per-call times of a function for a testcase between a run and a baseline run.
+    """
+    testcase: int
+    func: str
+    baseline_median_ns: float
+    median_ns: float
+    p_value: float
+    verdict: Verdict
+
+    @property
+    def change(self) -> float:
+        """
+        Relative change of the median; positive is slower.
+        """
+        return self.median_ns / self.baseline_median_ns - 1 if self.baseline_median_ns > 0 else float('inf')
+
+    def text(self) -> str:
+        baseline = human_friendly.seconds(self.baseline_median_ns / 10**9, decimal_precision=4)
+        current = human_friendly.seconds(self.median_ns / 10**9, decimal_precision=4)
+        verdict_colors = {Verdict.Regression: colorama.Fore.RED, Verdict.Improvement: colorama.Fore.GREEN, Verdict.NoChange: colorama.Fore.RESET}
+        return f'[{colorize(f"{self.verdict.name:11}", verdict_colors[self.verdict])}] {self.func} (testcase {self.testcase}): {baseline} -> {current} ({self.change:+.2%}, p = {self.p_value:.4f})'
+
+    def __str__(self):
+        return self.text()
+
+def _per_call_ns(result: dict) -> list[float]:
+    return [elapsed_ns / calls for elapsed_ns, calls in zip(result['samples']['elapsed_ns'], result['samples']['calls'])]
+
+def compare_runs(run: dict, baseline: dict, alpha: float = 0.05, min_change: float = 0.0) -> list[RunComparison]:
+    """
+    Compares per-call times of each (testcase, function) in both :run: and :baseline: with the Mann-Whitney U test (see stats.mann_whitney_u()).
+
+    Args:
+        alpha: Significance level.
+        min_change: Minimum relative change of the median to be flagged, so that significant but negligible changes are ignored.
+
+    Returns: A list of RunComparison, in the order of :run:.
+        Regression or Improvement is flagged if the p-value is less than :alpha: and the median changed by more than :min_change:.
+    """
+    baseline_results = {(result['testcase_key'], result['func']): result for result in baseline['results']}
+    comparisons = []
+    for result in run['results']:
+        baseline_result = baseline_results.get((result['testcase_key'], result['func']))
+        if baseline_result is None:
+            continue
+
+        per_call_ns, baseline_per_call_ns = _per_call_ns(result), _per_call_ns(baseline_result)
+        median_ns, baseline_median_ns = stats.statistic(per_call_ns, 'median'), stats.statistic(baseline_per_call_ns, 'median')
+        _, p_value = stats.mann_whitney_u(per_call_ns, baseline_per_call_ns)
+        verdict = Verdict.NoChange
+        if p_value < alpha:
+            if median_ns > baseline_median_ns * (1 + min_change):
+                verdict = Verdict.Regression
+            elif median_ns < baseline_median_ns * (1 - min_change):
+                verdict = Verdict.Improvement
+        comparisons.append(RunComparison(result['testcase'], result['func'], baseline_median_ns, median_ns, p_value, verdict))
+
+    return comparisons
+
+def _run_text(run: dict) -> str:
+    label = f' [{run["label"]}]' if run.get('label') else ''
+    return f'{run["run_id"]}{label} at {run["timestamp"]}'
+
+def comparison_summary(comparisons: list[RunComparison], run: dict, baseline: dict) -> list[str]:
+    lines = [f'Comparison: {_run_text(run)} against baseline {_run_text(baseline)}']
+    for key, name in (('python', 'Python implementations'), ('gil', 'GIL statuses'), ('host', 'Hosts')):
+        if run.get(key) != baseline.get(key):
+            lines.append(colorize(f'Note: {name} differ: {run.get(key)} vs. {baseline.get(key)} (baseline)', colorama.Fore.YELLOW))
+    lines.extend(f' - {comparison}' for comparison in comparisons)
+    counts = {verdict: sum(1 for comparison in comparisons if comparison.verdict == verdict) for verdict in Verdict}
+    lines.append(f'{counts[Verdict.Regression]} regressions, {counts[Verdict.Improvement]} improvements, {counts[Verdict.NoChange]} unchanged')
+    return lines
+
+def main(argv: typing.Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark history')
+    parser.add_argument('--path', default=DEFAULT_HISTORY_PATH, help='History file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='List runs')
+    compare_parser = commands.add_parser('compare', help='Compare a run against a baseline run')
+    compare_parser.add_argument('run', nargs='?', default=None, help='Run ID or label (default: the latest run)')
+    compare_parser.add_argument('--baseline', default=None, help='Run ID or label of the baseline (default: the run before RUN)')
+    compare_parser.add_argument('--alpha', type=float, default=0.05, help='Significance level (default: %(default)s)')
+    compare_parser.add_argument('--min-change', type=float, default=0.0, help='Minimum relative change of medians to flag (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    history = BenchmarkHistory(args.path)
+    if args.command == 'list':
+        for run in history.runs():
+            print(f'{_run_text(run)}: {run["python"]}, {len(run["results"])} results')
+        return 0
+
+    try:
+        run = history.find_run(args.run)
+        baseline = history.find_run(args.baseline) if args.baseline is not None else None
+    except KeyError as error:
+        parser.error(error.args[0])
+    if baseline is None:
+        runs = history.runs()
+        index = next(i for i in range(len(runs) - 1, -1, -1) if runs[i]['run_id'] == run['run_id'])
+        if index == 0:
+            parser.error(f'No run before {run["run_id"]} to compare with; give --baseline.')
+        baseline = runs[index - 1]
+
+    comparisons = compare_runs(run, baseline, alpha=args.alpha, min_change=args.min_change)
+    for line in comparison_summary(comparisons, run, baseline):
+        print(line)
+    # Non-zero exit status for regressions, e.g. to fail a CI job
+    return 1 if any(comparison.verdict == Verdict.Regression for comparison in comparisons) else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
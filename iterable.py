@@ -14,12 +14,17 @@ def get_dims(value: typing.Any) -> list:
         if value is str, returns [len(value),]
         However, for strings inside sequences, their lengths are not included;
         only the dimensions of the container structure is returend.
+        For NumPy arrays and memoryviews (also inside sequences), their shapes are used as is.
     """
     dims = []
     try:
         while True:
+            shape = getattr(value, 'shape', None)
+            if isinstance(shape, tuple):
+                dims.extend(shape)
+                break
             # If string is encountered inside sequence
-            if value[0] == value:
+            if (getattr(value[0], 'shape', None) is None) and (value[0] == value):
                 break
             dims.append(len(value))
             value = value[0]
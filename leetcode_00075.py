@@ -6,6 +6,7 @@
     https://leetcode.com/problems/sort-colors/
 """
 
+import random
 import typing
 
 # ---------- Reference function - brute force method ---------- #
@@ -59,69 +60,49 @@ def sortColors_two_pointer(nums: list[int]) -> None:
 
 # ---------- tow pointer ---------- #
 
+# ---------- Testcase generator ---------- #
+
+def generate_testcase(rng: random.Random, size_range: tuple[int, int] = (1, 300)) -> tuple[list[int]]:
+    """
+        rng must be the only source of randomness; see generation.generate_testcases().
+    """
+    n = rng.randint(*size_range)
+    return ([rng.randint(0, 2) for _ in range(n)],)
+
+# ---------- Testcase generator ---------- #
+
 
 
 
 if __name__ == '__main__':
     import random
-    import math
     import enum
     import typing
 
+    import itertools
+
     from tests import time_funcs_testcases
     from tests import run_funcs_testcases
-
-    from strs import fitlength
-    from iterable import get_dims
+    from generation import generate_testcases
+    from corpus import cached_testcases, DEFAULT_CACHE_DIR
 
     TestcaseArgsType = tuple[list[int]] # (nums: list[int],)
     ExpectedReturnType = None
-    GenerationParamsType = dict[str, typing.Any] # dict(seed_range: tuple[int, int], )
+    GenerationParamsType = dict[str, typing.Any] # dict(size_range: tuple[int, int], )
     GeneratorInternalParamsType = dict[str, typing.Any] # dict()
     
-    def fill_testcases(ref_func: typing.Callable, n_testcases: int, initial_seed: int, **generation_params: GenerationParamsType) -> None:
+    def fill_testcases(ref_func: typing.Callable, n_testcases: int, initial_seed: int, workers: typing.Optional[int] = None, cache_dir: typing.Optional[str] = DEFAULT_CACHE_DIR, **generation_params: GenerationParamsType) -> typing.Iterator[tuple[TestcaseArgsType, typing.Any]]:
         """
-            Modify the return of generate_func_arguments_set accordingly.
+            Modify generate_testcase accordingly.
+            Testcases are generated lazily (in a process pool if workers is given), while earlier testcases are being tested.
+            If cache_dir is not None, testcases are loaded from the corpus cache if the generator parameters and sources are unchanged.
         """
-        def arg_text(value: typing.Any, max_len: int, format_spec: typing.Optional[str] = None) -> str:
-            dims = get_dims(value)
-            dims_text = '' if len(dims) == 0 else f'[dims: {" x ".join(map(str, dims))}] '
-            
-            return dims_text + fitlength(format_spec.format(value) if format_spec is not None else str(value), max_len)
-        
-        def generate_func_arguments_set(generation_params: GenerationParamsType) -> list[typing.Any]:
-            """
-                Must return: A tuple of (label, argumemt, format_spec or None),
-                    in the same order as function arguments to the test case generator.
-            """
-            class Bundle:
-                def __init__(self, adict):
-                    self.__dict__.update(adict)
-
-            params = Bundle(generation_params)
-            return (
-                ('seed', random.randint(*params.seed_range), None),
-            )
-
-        value_max_len = 200
-
-        print(f'Generating {n_testcases} test cases...')
-        n_testcases_len = int(math.log10(n_testcases)) + 1 if n_testcases > 0 else 0
-        random.seed(initial_seed)
-        params = [generate_func_arguments_set(generation_params) for _ in range(n_testcases)]
-        for index, generator_args_set in enumerate(params, start=1):
-            generator_args_str = ', '.join(f'{label}: {value:{fmt_spec if fmt_spec is not None else ""}}' for label, value, fmt_spec in generator_args_set)
-            print(f'[{index:>{n_testcases_len}}] {generator_args_str}')
-            args, internal_params = generate_testcase(*(arg for _, arg, _ in generator_args_set))
-            internal_params_str = ', '.join([f'{label}: {value}' for label, value in internal_params.items()])
-            if len(internal_params_str) > 0:
-                print(f'[{index:>{n_testcases_len}}] {internal_params_str}')
-            args_text = ', '.join([arg_text(arg, value_max_len) for arg in args])
-            print(f'[{index:>{n_testcases_len}}] Arguments: {args_text}')
-            result = ref_func(*args)
-            print(f'[{index:>{n_testcases_len}}] Expected: {arg_text(result, value_max_len)}')
-            test_cases.append((args, result))
-            print()
+        if cache_dir is None:
+            print(f'Generating {n_testcases} test cases...')
+            return generate_testcases(generate_testcase, ref_func, n_testcases, initial_seed, workers=workers, **generation_params)
+
+        print(f'Generating or loading {n_testcases} test cases...')
+        return cached_testcases(generate_testcase, ref_func, n_testcases, initial_seed, cache_dir=cache_dir, workers=workers, **generation_params)
 
     # ---------- Handpicked testcases ---------- #
     
@@ -153,7 +134,7 @@ if __name__ == '__main__':
     
     generator_parameters = dict(
         initial_seed = 38059403,
-        seed_range = (1, 100000),
+        size_range = (1, 300),
     )
 
     test_repeats = {
@@ -161,8 +142,16 @@ if __name__ == '__main__':
     radom_testcasses_test_repeats = 5
     default_test_repeats = 10000
 
+    # Adaptive sampling: sampling of a function stops once the confidence interval of its median is narrower than target_precision of it,
+    # once its share of case_time_budget seconds is spent, or after adaptive_test_repeats calls.
+    # Both None (the default) means fixed repeats; e.g. target_precision = 0.01 and case_time_budget = 3.0 for adaptive sampling.
+    target_precision = None
+    case_time_budget = None
+    adaptive_test_repeats = 1_000_000
+    adaptive = (target_precision is not None) or (case_time_budget is not None)
+
     test_repeats.update({
-        n_manual_testcases + i: radom_testcasses_test_repeats for i in range(len(test_cases) - n_manual_testcases)
+        n_manual_testcases + i: (radom_testcasses_test_repeats if not adaptive else adaptive_test_repeats) for i in range(n_random_testcases)
     })
     
     TestcaseMode = enum.Enum('TestcaseMode', ['Regular',])
@@ -181,7 +170,7 @@ if __name__ == '__main__':
     range_funcs = (
     )
 
-    fill_testcases(reference_func, n_random_testcases, **generator_parameters)
+    test_cases = itertools.chain(test_cases, fill_testcases(reference_func, n_random_testcases, **generator_parameters))
 
     def run_test(test_mode: TestcaseMode = TestcaseMode.Regular, run_mode: RunMode = RunMode.IndividualTest) -> None:
         match test_mode:
@@ -189,7 +178,10 @@ if __name__ == '__main__':
                 args = (funcs, test_cases)
                 kwargs = dict(
                     repeats = test_repeats, 
-                    default_repeats = default_test_repeats
+                    default_repeats = default_test_repeats if not adaptive else adaptive_test_repeats,
+                    batch_size = None,
+                    target_precision = target_precision,
+                    case_time_budget = case_time_budget,
                 )
 
         match run_mode:
@@ -4,10 +4,17 @@
 """
 from __future__ import annotations
 
+import bisect
 import enum
 from numbers import Number
+import random
 import typing
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 EqualitySideType = enum.Enum('EqualitySideType', ['Neither', 'Left', 'Right', 'Both'])
 
@@ -44,6 +51,42 @@ class IntervalMap:
 
         self._default = default
         self._equality = equality
+        self._build_lookup_tables()
+
+    @staticmethod
+    def _interval_contains(lower_bound: Number, upper_bound: Number, value: typing.Any, equality: EqualitySideType) -> bool:
+        """
+        Tests whether :value: is in [lower_bound, upper_bound], of which ends are closed according to :equality:.
+        Infinite bounds are always closed.
+        """
+        lower_closed = (lower_bound == float('-inf')) or (equality in (EqualitySideType.Left, EqualitySideType.Both))
+        upper_closed = (upper_bound == float('inf')) or (equality in (EqualitySideType.Right, EqualitySideType.Both))
+        return (lower_bound <= value if lower_closed else lower_bound < value) and (value <= upper_bound if upper_closed else value < upper_bound)
+
+    def _build_lookup_tables(self) -> None:
+        """
+        Splits the number line at the finite bounds into points and open segments between them,
+        and resolves the mapped value of each, so that lookup() is a binary search.
+
+        An interval either covers an open segment entirely or is disjoint from it, since segments contain no bounds.
+        Where intervals overlap, the first one in the map wins, same as a linear scan.
+        """
+        self._points = sorted({bound for interval in self._map for bound in interval if float('-inf') < bound < float('inf')})
+
+        def resolve(contains):
+            for interval, mapped in self._map.items():
+                if contains(*interval):
+                    return mapped
+            return self._default
+
+        self._point_values = [resolve(lambda lower, upper, point=point: self._interval_contains(lower, upper, point, self._equality)) for point in self._points]
+        # _segment_values[i] is for values in (_points[i - 1], _points[i]), where _points[-1] = -inf and _points[len(_points)] = inf.
+        segment_ends = [float('-inf'), *self._points, float('inf')]
+        self._segment_values = [resolve(lambda lower, upper, start=start, end=end: (lower <= start) and (end <= upper)) for start, end in zip(segment_ends, segment_ends[1:])]
+        self._n_points = len(self._points)
+        # Buckets in the order along the number line: 2i is the segment below _points[i], 2i + 1 is _points[i].
+        self._bucket_values = [value for pair in zip(self._segment_values, [*self._point_values, None]) for value in pair][:-1]
+        self._numpy_tables = None
 
     def lookup(self, lookup_value: typing.Any) -> typing.Any:
         """
@@ -59,17 +102,316 @@ class IntervalMap:
             )
             interval_match(:intervals_map:, equal_left=True)
         """
-        def lower_bound_test(bound):
-            return bound < lookup_value if (bound > float('-inf')) and (self._equality not in (EqualitySideType.Left, EqualitySideType.Both)) else bound <= lookup_value
-        
-        def upper_bound_test(bound):
-            return lookup_value < bound if (bound < float('inf')) and (self._equality in (EqualitySideType.Left, EqualitySideType.Neither)) else lookup_value <= bound
-        
-        for (lower_bound, upper_bound), mapped in self._map.items():
-            if lower_bound_test(lower_bound) and upper_bound_test(upper_bound):
-                return mapped
-        
-        return self._default
+        # NaN is in no interval.
+        if lookup_value != lookup_value:
+            return self._default
+
+        index = bisect.bisect_left(self._points, lookup_value)
+        if (index < self._n_points) and (self._points[index] == lookup_value):
+            return self._point_values[index]
+        return self._segment_values[index]
+
+    @property
+    def n_buckets(self) -> int:
+        """
+        Number of buckets, i.e. finite bounds and open segments between them, which lookup_many(indices=True) returns indices of.
+        """
+        return len(self._bucket_values)
+
+    def bucket_value(self, bucket: int) -> typing.Any:
+        """
+        Returns: Mapped value of :bucket:, or the default if :bucket: is -1.
+        """
+        return self._bucket_values[bucket] if bucket >= 0 else self._default
+
+    def _bucket(self, lookup_value: typing.Any) -> int:
+        if lookup_value != lookup_value:
+            return -1
+        index = bisect.bisect_left(self._points, lookup_value)
+        return 2 * index + 1 if (index < self._n_points) and (self._points[index] == lookup_value) else 2 * index
+
+    def lookup_many(self, values: typing.Iterable[typing.Any], indices: bool = False) -> list | typing.Any:
+        """
+        Looks up all of :values: at once; same as [self.lookup(value) for value in :values:], but with a single sorted search if NumPy is installed.
+
+        Args:
+            values: A list, an array.array or another buffer, or a NumPy array of values.
+            indices: If True, returns bucket indices instead of mapped values.
+                Bucket 2i is the open segment below the i-th finite bound (in ascending order) and bucket 2i + 1 is the bound itself;
+                NaN is in bucket -1. See n_buckets and bucket_value().
+
+        Returns: A NumPy array if :values: is a NumPy array; otherwise a list.
+        """
+        is_ndarray = (numpy is not None) and isinstance(values, numpy.ndarray)
+        if numpy is not None:
+            array = numpy.asarray(values)
+            if (array.ndim == 1) and (array.dtype.kind in 'iufb'):
+                buckets = self._buckets_numpy(array)
+                if indices:
+                    return buckets if is_ndarray else buckets.tolist()
+                mapped = self._numpy_bucket_values()[buckets]
+                return mapped if is_ndarray else mapped.tolist()
+
+        buckets = [self._bucket(value) for value in values]
+        if indices:
+            return numpy.asarray(buckets, dtype=numpy.int64) if is_ndarray else buckets
+        mapped = [self.bucket_value(bucket) for bucket in buckets]
+        return numpy.asarray(mapped) if is_ndarray else mapped
+
+    def _numpy_bucket_values(self):
+        """
+        Returns: An array of mapped values of buckets, followed by the default for bucket -1.
+        """
+        if self._numpy_tables is None:
+            bucket_values = numpy.empty(len(self._bucket_values) + 1, dtype=object)
+            bucket_values[:] = [*self._bucket_values, self._default]
+            # Use a native dtype if all values are ints or all are floats, e.g. for mapping values to colour indices.
+            if {type(value) for value in bucket_values} in ({int}, {float}):
+                bucket_values = numpy.asarray(bucket_values.tolist())
+            self._numpy_tables = (numpy.asarray(self._points), bucket_values)
+        return self._numpy_tables[1]
+
+    def _buckets_numpy(self, values):
+        self._numpy_bucket_values()
+        points = self._numpy_tables[0]
+        indices = numpy.searchsorted(points, values, side='left')
+        if self._n_points > 0:
+            on_point = points[numpy.minimum(indices, self._n_points - 1)] == values
+            on_point &= indices < self._n_points
+        else:
+            on_point = numpy.zeros(len(values), dtype=bool)
+        buckets = 2 * indices.astype(numpy.int64) + on_point
+        if values.dtype.kind == 'f':
+            buckets[numpy.isnan(values)] = -1
+        return buckets
+
+
+OverlapPolicy = enum.Enum('OverlapPolicy', ['FirstWins', 'LastWins', 'Reject'])
+
+# Priorities of treap nodes, separate from the global random state of callers (e.g. seeded testcase generators).
+_random = random.Random()
+
+class _IntervalNode:
+    """
+    A treap node keyed by (lower, upper, sequence), augmented with the maximum upper bound in its subtree.
+    """
+    __slots__ = ('key', 'value', 'priority', 'left', 'right', 'max_upper')
+
+    def __init__(self, key: tuple[Number, Number, int], value: typing.Any) -> None:
+        self.key = key
+        self.value = value
+        self.priority = _random.random()
+        self.left = None
+        self.right = None
+        self.max_upper = key[1]
+
+    def update(self) -> None:
+        self.max_upper = self.key[1]
+        for child in (self.left, self.right):
+            if (child is not None) and (self.max_upper < child.max_upper):
+                self.max_upper = child.max_upper
+
+def _split(node: typing.Optional[_IntervalNode], key: tuple) -> tuple[typing.Optional[_IntervalNode], typing.Optional[_IntervalNode]]:
+    """
+    Returns: A tuple of treaps of keys < :key: and keys >= :key:.
+    """
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+def _merge(left: typing.Optional[_IntervalNode], right: typing.Optional[_IntervalNode]) -> typing.Optional[_IntervalNode]:
+    """
+    Merges treaps where all keys of :left: are less than those of :right:.
+    """
+    if (left is None) or (right is None):
+        return left if right is None else right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+class MutableIntervalMap:
+    """
+    Same as IntervalMap, but intervals can be inserted and deleted in O(log n) (expected) without rebuilding.
+
+    Intervals are kept in an interval tree (a treap ordered by lower bound, augmented with the maximum upper bound of each subtree),
+    so lookup() and overlapping() take O(log n + k), where k is the number of intervals overlapping the queried point or range.
+    k is at most 1 with OverlapPolicy.Reject.
+    """
+    Equality = EqualitySideType
+    Overlap = OverlapPolicy
+
+    def __init__(self, intervals_map: typing.Optional[dict[tuple[Number, Number], typing.Any]] = None, default: typing.Optional[typing.Any] = None, equality: EqualitySideType = EqualitySideType.Left, overlap: OverlapPolicy = OverlapPolicy.FirstWins) -> None:
+        """
+        Args:
+            :intervals_map: A dictionary of {range: value}; see IntervalMap.
+                Inserted in the order IntervalMap resolves overlaps in: intervals with a None or missing bound come after the others.
+            :equality: Ends of intervals where equality is tested; see IntervalMap.
+            :overlap: Which interval a point covered by overlapping intervals maps to:
+                FirstWins: the earliest inserted one, same as IntervalMap.
+                LastWins: the latest inserted one, e.g. to override a band temporarily.
+                Reject: insert() raises ValueError if the interval overlaps another.
+        """
+        if overlap not in [v for v in OverlapPolicy]:
+            raise ValueError(f'Invalid overlap policy: {overlap}; must be among {[str(v) for v in OverlapPolicy]}')
+
+        self._default = default
+        self._equality = equality
+        self._lower_closed = equality in (EqualitySideType.Left, EqualitySideType.Both)
+        self._upper_closed = equality in (EqualitySideType.Right, EqualitySideType.Both)
+        self._overlap = overlap
+        self._root = None
+        # {(lower, upper): sequence}; sequence is the insertion order.
+        self._sequences = {}
+        self._next_sequence = 0
+        for interval, value in sorted((intervals_map or {}).items(), key=lambda item: (item[0][0] is None) or (len(item[0]) == 1) or (item[0][1] is None)):
+            self.insert(interval, value)
+
+    @staticmethod
+    def _normalized(interval: tuple) -> tuple[Number, Number]:
+        lower = interval[0] if interval[0] is not None else float('-inf')
+        upper = interval[1] if (len(interval) > 1) and (interval[1] is not None) else float('inf')
+        if upper < lower:
+            raise ValueError(f'Invalid interval: {interval}; the lower bound is greater than the upper bound')
+        return lower, upper
+
+    def _contains(self, lower: Number, upper: Number, value: typing.Any) -> bool:
+        """
+        Same as IntervalMap._interval_contains(), inlined for lookup().
+        """
+        return ((lower < value) or ((lower == value) and (self._lower_closed or (lower == float('-inf'))))) \
+            and ((value < upper) or ((value == upper) and (self._upper_closed or (upper == float('inf')))))
+
+    def _intersects(self, a: tuple[Number, Number], b: tuple[Number, Number]) -> bool:
+        lower, upper = max(a[0], b[0]), min(a[1], b[1])
+        if lower < upper:
+            # Unless an interval is empty, e.g. (x, x) with EqualitySideType.Left.
+            return all((interval[0] < interval[1]) or self._contains(*interval, interval[0]) for interval in (a, b))
+        return (lower == upper) and self._contains(*a, lower) and self._contains(*b, lower)
+
+    def insert(self, interval: tuple, value: typing.Any) -> None:
+        """
+        Inserts :interval: mapped to :value:, or replaces the value of :interval: if it is already in the map,
+        in which case it keeps its insertion order.
+
+        Raises: ValueError if the overlap policy is Reject and :interval: overlaps another interval.
+        """
+        interval = self._normalized(interval)
+        if self._overlap == OverlapPolicy.Reject:
+            for other, _ in self.overlapping(*interval):
+                if other != interval:
+                    raise ValueError(f'Interval {interval} overlaps {other}')
+
+        if interval in self._sequences:
+            self._find(interval).value = value
+            return
+
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        self._sequences[interval] = sequence
+        key = (*interval, sequence)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _IntervalNode(key, value)), right)
+
+    def delete(self, interval: tuple) -> typing.Any:
+        """
+        Deletes :interval:.
+
+        Returns: The value :interval: was mapped to.
+        Raises: KeyError if :interval: is not in the map.
+        """
+        interval = self._normalized(interval)
+        key = (*interval, self._sequences.pop(interval))
+        left, right = _split(self._root, key)
+        # The node of :key: is the smallest one on the right.
+        node, right = _split(right, (*interval, key[2] + 1))
+        self._root = _merge(left, right)
+        return node.value
+
+    def _find(self, interval: tuple[Number, Number]) -> _IntervalNode:
+        key = (*interval, self._sequences[interval])
+        node = self._root
+        while node.key != key:
+            node = node.left if key < node.key else node.right
+        return node
+
+    def _search(self, lower: Number, upper: Number, matches: typing.Callable[[tuple[Number, Number]], bool]) -> list[_IntervalNode]:
+        """
+        Returns: Nodes of intervals in [:lower:, :upper:] (a superset of candidates) which :matches:.
+        """
+        nodes = []
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            # Subtrees of which intervals all end before :lower: are skipped.
+            if (node is None) or (node.max_upper < lower):
+                continue
+            if matches(node.key[:2]):
+                nodes.append(node)
+            pending.append(node.left)
+            # Intervals on the right start at or after this one.
+            if node.key[0] <= upper:
+                pending.append(node.right)
+        return nodes
+
+    def overlapping(self, lower: typing.Optional[Number], upper: typing.Optional[Number] = None) -> list[tuple[tuple[Number, Number], typing.Any]]:
+        """
+        Args:
+            :lower:, :upper: Bounds of the queried range, of which ends are closed the same as the intervals in the map.
+                None means unbounded.
+
+        Returns: A list of (interval, value) overlapping the range, in ascending order of lower bounds.
+        """
+        query = self._normalized((lower, upper))
+        nodes = self._search(*query, lambda interval: self._intersects(interval, query))
+        return [(node.key[:2], node.value) for node in sorted(nodes, key=lambda node: node.key)]
+
+    def lookup(self, lookup_value: typing.Any) -> typing.Any:
+        # NaN is in no interval.
+        if lookup_value != lookup_value:
+            return self._default
+
+        nodes = self._search(lookup_value, lookup_value, lambda interval: self._contains(*interval, lookup_value))
+        if not nodes:
+            return self._default
+        choose = max if self._overlap == OverlapPolicy.LastWins else min
+        return choose(nodes, key=lambda node: node.key[2]).value
+
+    def items(self) -> list[tuple[tuple[Number, Number], typing.Any]]:
+        """
+        Returns: A list of (interval, value), in insertion order.
+        """
+        return [(interval, self._find(interval).value) for interval in self._sequences]
+
+    def to_interval_map(self) -> IntervalMap:
+        """
+        Returns: A frozen IntervalMap of the current intervals, which supports lookup_many().
+        """
+        items = self.items()
+        if self._overlap == OverlapPolicy.LastWins:
+            items.reverse()
+        return IntervalMap(dict(items), self._default, self._equality)
+
+    def __len__(self) -> int:
+        return len(self._sequences)
+
+    def __contains__(self, interval: tuple) -> bool:
+        return self._normalized(interval) in self._sequences
+
+    def __setitem__(self, interval: tuple, value: typing.Any) -> None:
+        self.insert(interval, value)
+
+    def __delitem__(self, interval: tuple) -> None:
+        self.delete(interval)
 
 
 ThresholdType = enum.Enum('BoundType', ['LowerBound', 'UpperBound'])
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+    pools.py
+
+Process pools of which workers are pinned to distinct physical cores, and submission of work to them ahead of its consumption.
+"""
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import threading
+import typing
+import warnings
+
+
+def _physical_core_cpus(cpus: list[int]) -> list[int]:
+    """
+    Returns: One logical CPU of each physical core among :cpus:, so that SMT siblings are not used together.
+        If CPU topology is not available, :cpus: is returned as is.
+    """
+    core_cpus = []
+    seen_siblings = set()
+    for cpu in cpus:
+        try:
+            with open(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list') as f:
+                siblings = f.read().strip()
+        except OSError:
+            return cpus
+        if siblings not in seen_siblings:
+            seen_siblings.add(siblings)
+            core_cpus.append(cpu)
+
+    return core_cpus
+
+def _pin_worker(cpu_queue: multiprocessing.Queue) -> None:
+    # A failure breaks the pool (concurrent.futures.process.BrokenProcessPool) after the error is logged, rather than leaving the worker unpinned.
+    # A CPU is queued for each worker, but may not be readable yet while the queue is being fed, so get() blocks.
+    os.sched_setaffinity(0, {cpu_queue.get()})
+
+# Logical CPUs to which workers of live process pools are pinned,
+# so that pools used together (e.g. one generating testcases and one timing them) never share a core.
+_reserved_cpus = set()
+_reserved_cpus_lock = threading.Lock()
+
+class ProcessPool(concurrent.futures.ProcessPoolExecutor):
+    """
+    A process pool created by process_pool() with :workers: workers, each pinned to one of :cpus: unless :cpus: is empty.
+    The CPUs are released for other pools on shutdown.
+    """
+    def __init__(self, workers: int, cpus: typing.Sequence[int] = ()):
+        self.workers = workers
+        self.cpus = list(cpus)
+        if len(self.cpus) == 0:
+            super().__init__(max_workers=workers)
+            return
+
+        cpu_queue = multiprocessing.Queue()
+        for cpu in self.cpus:
+            cpu_queue.put(cpu)
+        super().__init__(max_workers=workers, initializer=_pin_worker, initargs=(cpu_queue,))
+
+    def shutdown(self, *args, **kwargs) -> None:
+        super().shutdown(*args, **kwargs)
+        with _reserved_cpus_lock:
+            _reserved_cpus.difference_update(self.cpus)
+        self.cpus = []
+
+def process_pool(workers: int) -> ProcessPool:
+    """
+    Creates a process pool for tests.run_funcs_testcases(), tests.time_funcs_testcases() and generation.generate_testcases().
+
+    Where CPU affinity is supported (Linux), each worker is pinned to a distinct physical core not used by other live pools of this process,
+    so that workers never share a core. If fewer such cores are free, :workers: is capped to their number with a RuntimeWarning.
+
+    Raises: RuntimeError if CPU affinity is supported and no physical core is free.
+    """
+    if workers < 1:
+        raise ValueError(f'Number of workers must be positive. (Given: {workers})')
+
+    if not hasattr(os, 'sched_setaffinity'):
+        return ProcessPool(workers)
+
+    with _reserved_cpus_lock:
+        free_cpus = [cpu for cpu in _physical_core_cpus(sorted(os.sched_getaffinity(0))) if cpu not in _reserved_cpus]
+        if len(free_cpus) == 0:
+            raise RuntimeError(f'No physical core is free for a process pool; all are pinned by other pools (CPUs {sorted(_reserved_cpus)}). Shut them down, or share an executor.')
+        cpus = free_cpus[:workers]
+        _reserved_cpus.update(cpus)
+
+    if len(cpus) < workers:
+        warnings.warn(f'Process pool workers are capped from {workers} to {len(cpus)}, the number of free physical cores.', RuntimeWarning, stacklevel=2)
+    return ProcessPool(len(cpus), cpus)
+
+def pool_context(workers: int | concurrent.futures.Executor) -> typing.ContextManager[concurrent.futures.Executor]:
+    """
+    An executor given by the caller is used as is and is not shut down.
+    """
+    if isinstance(workers, concurrent.futures.Executor):
+        return contextlib.nullcontext(workers)
+    return process_pool(workers)
+
+def pool_window(pool: concurrent.futures.Executor) -> int:
+    """
+    Returns: Number of units submitted to :pool: ahead of the one being reported: the number of workers of a ProcessPool,
+        or the number of CPUs for other executors, of which numbers of workers are not public.
+    """
+    return pool.workers if isinstance(pool, ProcessPool) else (os.cpu_count() or 1)
+
+def submitted_ahead(items: typing.Iterable, submit: typing.Optional[typing.Callable[[typing.Any], typing.Any]], window: int) -> typing.Iterator[tuple[typing.Any, typing.Any]]:
+    """
+    Yields (item, submit(item)) in the order of :items:, submitting up to :window: items ahead of the one yielded,
+    so that :items: can be produced lazily while earlier items are processed.
+    If :submit: is None, yields (item, None).
+    """
+    if submit is None:
+        for item in items:
+            yield item, None
+        return
+
+    pending = collections.deque()
+    for item in items:
+        pending.append((item, submit(item)))
+        if len(pending) > window:
+            yield pending.popleft()
+    while len(pending) > 0:
+        yield pending.popleft()
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+    profiling.py
+
+Line-level hot-spot profiles of functions, collected in a pass separate from timing.
+On Python 3.12+, lines and direct callees of a function are timed with sys.monitoring (PEP 669), only while the function's own code runs;
+on earlier versions, cProfile attributes time to callees only.
+"""
+from __future__ import annotations
+
+import cProfile
+import copy
+import dataclasses
+import functools
+import inspect
+import linecache
+import os
+import pstats
+import sys
+import time
+import types
+import typing
+
+from strs import fitlength
+import human_friendly
+
+
+# Target duration of a profiling pass, including the overhead of profiling.
+PROFILE_MIN_NS = 100_000_000
+
+@dataclasses.dataclass(frozen=True)
+class LineProfile:
+    """
+    Time spent on a source line, from the start of the line to the start of the next line of the same frame, including calls made by it.
+    """
+    filename: str
+    lineno: int
+    hits: int
+    time_ns: int
+
+    @property
+    def source(self) -> str:
+        return linecache.getline(self.filename, self.lineno).strip()
+
+@dataclasses.dataclass(frozen=True)
+class CalleeProfile:
+    """
+    Calls made directly by a profiled function to :name:, and the time spent in them.
+    """
+    name: str
+    calls: int
+    time_ns: int
+
+@dataclasses.dataclass(frozen=True)
+class FuncProfile:
+    """
+    Profile of :calls: calls of a function, which took :total_ns: in total while profiled.
+    Times are inflated by the overhead of profiling, so they are meaningful relative to :total_ns: rather than to timings.
+    """
+    name: str
+    collector: str
+    calls: int
+    total_ns: int
+    lines: tuple[LineProfile, ...] = ()
+    callees: tuple[CalleeProfile, ...] = ()
+
+    def hot_lines(self, top: int = 8) -> list[LineProfile]:
+        return sorted(self.lines, key=lambda line: line.time_ns, reverse=True)[:top]
+
+    def hot_callees(self, top: int = 5) -> list[CalleeProfile]:
+        return sorted(self.callees, key=lambda callee: callee.time_ns, reverse=True)[:top]
+
+    def share(self, time_ns: int) -> float:
+        return time_ns / self.total_ns if self.total_ns > 0 else 0.0
+
+    def report_lines(self, top_lines: int = 8, top_callees: int = 5, source_maxlen: int = 80) -> list[str]:
+        """
+        Returns: Lines of a report of the hottest :top_lines: source lines, in source order, and the hottest :top_callees: callees.
+        """
+        per_call = human_friendly.seconds(self.total_ns / max(self.calls, 1) / 10**9, decimal_precision=4)
+        lines = [f'Hot spots of {self.name}: ({self.collector}, {self.calls:,} calls, {per_call}/call profiled)']
+        hot_lines = sorted(self.hot_lines(top_lines), key=lambda line: (line.filename, line.lineno))
+        if len(hot_lines) > 0:
+            filenames = {line.filename for line in hot_lines}
+            rows = [('line', '%time', 'hits', 'source')]
+            for line in hot_lines:
+                location = f'{os.path.basename(line.filename)}:{line.lineno}' if len(filenames) > 1 else f'{line.lineno}'
+                rows.append((location, f'{self.share(line.time_ns):.2%}', f'{line.hits:,}', fitlength(line.source, maxlen=source_maxlen)))
+            widths = [max(len(row[i]) for row in rows) for i in range(3)]
+            for row in rows:
+                lines.append(f'   {row[0]:>{widths[0]}}  {row[1]:>{widths[1]}}  {row[2]:>{widths[2]}}  {row[3]}')
+        elif self.collector == 'cProfile':
+            lines.append('   (line-level times require sys.monitoring, Python 3.12+)')
+        hot_callees = self.hot_callees(top_callees)
+        if len(hot_callees) > 0:
+            rows = [(f'{self.share(callee.time_ns):.2%}', f'{callee.calls:,}', callee.name) for callee in hot_callees]
+            widths = [max(len(row[i]) for row in rows) for i in range(2)]
+            lines.append(' Callees:')
+            for row in rows:
+                lines.append(f'   {row[0]:>{widths[0]}}  {row[1]:>{widths[1]}} calls  {row[2]}')
+
+        return lines
+
+def _func_code(func: typing.Callable) -> typing.Optional[types.CodeType]:
+    while isinstance(func, functools.partial):
+        func = func.func
+    func = inspect.unwrap(func)
+    return getattr(func, '__code__', None)
+
+def _nested_codes(code: types.CodeType) -> typing.Iterator[types.CodeType]:
+    """
+    Yields :code: and code objects nested in it, e.g. of lambdas, inner functions and comprehensions.
+    """
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _nested_codes(const)
+
+def _callable_name(callable: typing.Any) -> str:
+    module = getattr(callable, '__module__', None)
+    name = getattr(callable, '__qualname__', None) or type(callable).__qualname__
+    return f'{module}.{name}' if module not in (None, 'builtins') else name
+
+class _MonitoringCollector:
+    """
+    Collects times of lines and direct callees of :codes: with sys.monitoring.
+
+    A frame of one of :codes: is tracked from PY_START (or PY_RESUME) to PY_RETURN (or PY_YIELD, PY_UNWIND);
+    a line lasts until the next LINE event of the frame, and a callee from its CALL event until the next event of the frame.
+    Clocks of a frame pause while a nested frame of :codes: (recursion, an inner function) runs, whose time goes to its own lines,
+    so that times are not counted twice.
+    A resumed frame (of a generator or a comprehension) gets no LINE event until it moves to another line,
+    so it is on the line of its resume point (e.g. the yield) from PY_RESUME.
+    """
+    EVENTS = ('LINE', 'CALL', 'C_RETURN', 'C_RAISE', 'PY_START', 'PY_RESUME', 'PY_RETURN', 'PY_YIELD', 'PY_UNWIND')
+
+    def __init__(self, codes: set[types.CodeType]):
+        self.codes = codes
+        # Tracked frames: [code, line, line start, callee, callee start, paused at, frame start]
+        self.frames = []
+        self.lines = {}
+        self.callees = {}
+        self.total_ns = 0
+        # {code: [(start offset, end offset, line)]}
+        self._line_ranges = {code: [(start, end, line) for start, end, line in code.co_lines() if line is not None] for code in codes}
+
+    def _end_callee(self, frame: list, now: int) -> None:
+        if frame[3] is not None:
+            self.callees[frame[3]][1] += now - frame[4]
+            frame[3] = None
+
+    def _end_line(self, frame: list, now: int) -> None:
+        if frame[1] is not None:
+            self.lines[(frame[0].co_filename, frame[1])][1] += now - frame[2]
+            frame[1] = None
+
+    def on_line(self, code, lineno):
+        if (len(self.frames) == 0) or (self.frames[-1][0] is not code):
+            return
+        now = time.perf_counter_ns()
+        frame = self.frames[-1]
+        self._end_callee(frame, now)
+        self._end_line(frame, now)
+        frame[1], frame[2] = lineno, now
+        self.lines.setdefault((code.co_filename, lineno), [0, 0])[0] += 1
+
+    def on_call(self, code, offset, callable, arg0):
+        if (len(self.frames) == 0) or (self.frames[-1][0] is not code):
+            return
+        now = time.perf_counter_ns()
+        frame = self.frames[-1]
+        self._end_callee(frame, now)
+        name = _callable_name(callable)
+        self.callees.setdefault(name, [0, 0])[0] += 1
+        frame[3], frame[4] = name, time.perf_counter_ns()
+
+    def on_c_return(self, code, offset, callable, arg0):
+        if (len(self.frames) > 0) and (self.frames[-1][0] is code):
+            self._end_callee(self.frames[-1], time.perf_counter_ns())
+
+    def on_start(self, code, offset):
+        now = time.perf_counter_ns()
+        if len(self.frames) > 0:
+            self.frames[-1][5] = now
+        self.frames.append([code, None, now, None, now, now, now])
+
+    def on_resume(self, code, offset):
+        self.on_start(code, offset)
+        for start, end, lineno in self._line_ranges.get(code, ()):
+            if start <= offset < end:
+                # Not a hit, as the line was not executed again.
+                self.frames[-1][1] = lineno
+                self.lines.setdefault((code.co_filename, lineno), [0, 0])
+                break
+
+    def on_return(self, code, offset, value):
+        if (code not in self.codes) or (len(self.frames) == 0) or (self.frames[-1][0] is not code):
+            return
+        now = time.perf_counter_ns()
+        frame = self.frames.pop()
+        self._end_callee(frame, now)
+        self._end_line(frame, now)
+        if len(self.frames) == 0:
+            self.total_ns += now - frame[6]
+        else:
+            caller = self.frames[-1]
+            caller[2] += now - caller[5]
+            caller[4] += now - caller[5]
+
+    def __enter__(self):
+        monitoring = sys.monitoring
+        self.tool_id = monitoring.PROFILER_ID
+        try:
+            monitoring.use_tool_id(self.tool_id, 'testcase.profiling')
+        except ValueError:
+            raise RuntimeError(f'sys.monitoring tool {self.tool_id} is in use by {monitoring.get_tool(self.tool_id)}') from None
+        events = monitoring.events
+        callbacks = dict(LINE=self.on_line, CALL=self.on_call, C_RETURN=self.on_c_return, C_RAISE=self.on_c_return,
+                         PY_START=self.on_start, PY_RESUME=self.on_resume, PY_RETURN=self.on_return, PY_YIELD=self.on_return, PY_UNWIND=self.on_return)
+        for name, callback in callbacks.items():
+            monitoring.register_callback(self.tool_id, getattr(events, name), callback)
+        local_events = events.LINE | events.CALL | events.PY_START | events.PY_RESUME | events.PY_RETURN | events.PY_YIELD
+        for code in self.codes:
+            monitoring.set_local_events(self.tool_id, code, local_events)
+        # PY_UNWIND cannot be set locally; callbacks return right away for other code.
+        monitoring.set_events(self.tool_id, events.PY_UNWIND)
+        return self
+
+    def __exit__(self, *exc_info):
+        monitoring = sys.monitoring
+        monitoring.set_events(self.tool_id, 0)
+        for code in self.codes:
+            monitoring.set_local_events(self.tool_id, code, 0)
+        for name in self.EVENTS:
+            monitoring.register_callback(self.tool_id, getattr(monitoring.events, name), None)
+        monitoring.free_tool_id(self.tool_id)
+
+def _profile_calls(call: typing.Callable, args: tuple, fresh_args: bool, min_ns: int, max_calls: int, enable: typing.Callable[[], None], disable: typing.Callable[[], None]) -> int:
+    """
+    Calls :call: with profiling enabled until :min_ns: elapses or :max_calls: calls are made, at least once.
+    Fresh copies of :args: are made with profiling disabled.
+
+    Returns: Number of calls made.
+    """
+    perf_counter_ns = time.perf_counter_ns
+    start = perf_counter_ns()
+    calls = 0
+    while True:
+        call_args = copy.deepcopy(args) if fresh_args else args
+        enable()
+        try:
+            call(*call_args)
+        finally:
+            disable()
+        calls += 1
+        if (calls >= max_calls) or (perf_counter_ns() - start >= min_ns):
+            return calls
+
+def profile_func(func: typing.Callable, *args, call: typing.Optional[typing.Callable] = None, fresh_args: bool = False, min_ns: int = PROFILE_MIN_NS, max_calls: int = sys.maxsize) -> typing.Optional[FuncProfile]:
+    """
+    Profiles calls of :func: until :min_ns: elapses or :max_calls: calls are made.
+
+    Args:
+        call: A callable calling :func: with :args:, e.g. one running a coroutine function to completion; defaults to :func:.
+        fresh_args: If True, every call gets its own deep copy of :args:, made outside the profiled region.
+
+    Returns: A FuncProfile, or None if :func: has no Python code (e.g. a built-in function).
+    """
+    code = _func_code(func)
+    if code is None:
+        return None
+    call = call if call is not None else func
+    name = f'{getattr(func, "__module__", None) or code.co_filename}.{code.co_qualname if hasattr(code, "co_qualname") else code.co_name}'
+
+    if hasattr(sys, 'monitoring'):
+        collector = _MonitoringCollector(set(_nested_codes(code)))
+        with collector:
+            # Events are always delivered; collection is confined to frames of the profiled code.
+            calls = _profile_calls(call, args, fresh_args, min_ns, max_calls, lambda: None, lambda: None)
+        return FuncProfile(
+            name, 'sys.monitoring', calls, collector.total_ns,
+            lines=tuple(LineProfile(filename, lineno, hits, time_ns) for (filename, lineno), (hits, time_ns) in collector.lines.items()),
+            callees=tuple(CalleeProfile(callee, callee_calls, time_ns) for callee, (callee_calls, time_ns) in collector.callees.items()),
+        )
+
+    profiler = cProfile.Profile()
+    calls = _profile_calls(call, args, fresh_args, min_ns, max_calls, profiler.enable, profiler.disable)
+    profile_stats = pstats.Stats(profiler).stats
+    func_key = (code.co_filename, code.co_firstlineno, code.co_name)
+    total_ns = round(profile_stats[func_key][3] * 10**9) if func_key in profile_stats else 0
+    callees = []
+    for (filename, lineno, callee_name), (_, _, _, _, callers) in profile_stats.items():
+        if func_key in callers:
+            callee_calls, _, _, cumulative = callers[func_key]
+            label = callee_name if filename == '~' else f'{callee_name} ({os.path.basename(filename)}:{lineno})'
+            callees.append(CalleeProfile(label, callee_calls, round(cumulative * 10**9)))
+    return FuncProfile(name, 'cProfile', calls, total_ns, callees=tuple(callees))
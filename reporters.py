@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+    reporters.py
+
+Reporters of events of tests.time_funcs_testcases(): the coloured console output, JSON lines, CSV, or nothing.
+"""
+from __future__ import annotations
+
+import csv
+import dataclasses
+import functools
+import json
+import sys
+import typing
+
+from timer import ExecTimes
+import stats
+
+
+def _func_name(func: typing.Callable) -> str:
+    func = func.func if isinstance(func, functools.partial) else func
+    return f'{func.__module__}.{func.__qualname__}'
+
+class Reporter:
+    """
+    Receives events of a timing run; all events are ignored by default.
+
+    Events are, in order:
+    - run_started
+    - testcase_started, func_measured (for each function) and summary_ready, for each run case
+    - run_finished
+
+    Testcases are passed as texts formatted when events occur (see tests.BaseFuncTestcase.formatted_args()),
+    since functions may modify arguments in place and testcases should not be kept alive by deferred events.
+    """
+    # Whether timer.exec_times() prints progress messages while measuring, when events are not deferred.
+    progress = False
+
+    def run_started(self, python: str, gil_enabled: bool) -> None:
+        pass
+
+    def testcase_started(self, runcase: int, testcase_index: int, formatted_args: tuple[list[tuple[str, str]], tuple[str, str]], repeats: int) -> None:
+        pass
+
+    def func_measured(self, runcase: int, testcase_index: int, func: typing.Callable, times: ExecTimes, passed: bool) -> None:
+        pass
+
+    def summary_ready(self, runcase: int, testcase_index: int, result_texts: dict[typing.Callable, str], times: ExecTimes, passed: dict[typing.Callable, bool]) -> None:
+        pass
+
+    def run_finished(self, results: list[tuple[int, ExecTimes]]) -> None:
+        pass
+
+# A reporter reporting nothing
+NullReporter = Reporter
+
+class DeferredReporter(Reporter):
+    """
+    Queues events and passes them to :reporter: on flush(), so that no reporting work (formatting, terminal or file I/O) is done between measurements.
+    ExecTimes of queued events are kept until flushed.
+    """
+    def __init__(self, reporter: Reporter):
+        self.reporter = reporter
+        self._events = []
+
+    def run_started(self, *args) -> None:
+        self._events.append(('run_started', args))
+
+    def testcase_started(self, *args) -> None:
+        self._events.append(('testcase_started', args))
+
+    def func_measured(self, *args) -> None:
+        self._events.append(('func_measured', args))
+
+    def summary_ready(self, *args) -> None:
+        self._events.append(('summary_ready', args))
+
+    def run_finished(self, *args) -> None:
+        self._events.append(('run_finished', args))
+
+    def flush(self) -> None:
+        events, self._events = self._events, []
+        for name, args in events:
+            getattr(self.reporter, name)(*args)
+
+def print_formatted_args(formatted_args: tuple[list[tuple[str, str]], tuple[str, str]]) -> None:
+    args, expected = formatted_args
+    print('* [Arguments] *')
+    for name, value in args:
+        print(f'- {name}\t{value}')
+    print('* {}\t{}'.format(*expected))
+
+class ConsoleReporter(Reporter):
+    """
+    The coloured console output of arguments and summaries.
+    """
+    progress = True
+
+    def run_started(self, python: str, gil_enabled: bool) -> None:
+        print()
+        print(f'Python Implementation: {python} ({"GIL enabled" if gil_enabled else "GIL disabled"})')
+        print()
+
+    def testcase_started(self, runcase: int, testcase_index: int, formatted_args: tuple[list[tuple[str, str]], tuple[str, str]], repeats: int) -> None:
+        print(f'----- Run Case [{runcase}]: Test Case [{testcase_index}] x {repeats:,} iterations -----')
+        print_formatted_args(formatted_args)
+        print()
+
+    def summary_ready(self, runcase: int, testcase_index: int, result_texts: dict[typing.Callable, str], times: ExecTimes, passed: dict[typing.Callable, bool]) -> None:
+        times.print_summary(result_texts)
+        print()
+
+class _FileReporter(Reporter):
+    """
+    A reporter writing to :file:, either a path (opened on the first write and closed when the run finishes) or a text file object.
+    """
+    def __init__(self, file: str | typing.TextIO = sys.stdout):
+        self._path = file if isinstance(file, str) else None
+        self._file = None if isinstance(file, str) else file
+
+    @property
+    def file(self) -> typing.TextIO:
+        if self._file is None:
+            self._file = open(self._path, 'w', encoding='utf-8', newline='')
+        return self._file
+
+    def run_finished(self, results: list[tuple[int, ExecTimes]]) -> None:
+        if self._path is not None and self._file is not None:
+            self._file.close()
+            self._file = None
+        elif self._file is not None:
+            self._file.flush()
+
+def _func_record(times: ExecTimes, func: typing.Callable, passed: bool) -> dict[str, typing.Any]:
+    memory = times._memory.get(func)
+    warmup = times._warmups.get(func)
+    resources = times._resources.get(func)
+    precision = times._precision.get(func)
+    async_measurement = times._async.get(func)
+    return dict(
+        func=_func_name(func),
+        description=getattr(func, '__description__', None),
+        passed=passed,
+        batch_size=times._batch_sizes.get(func, 1),
+        samples=len(times.samples(func)),
+        calls=times.samples(func).total_calls,
+        **{f'{name}_ns': value for name, value in times.samples(func).describe().items()},
+        gc_collections=times._gc_collections.get(func, 0),
+        gc_ns=times.samples(func).total_gc_ns,
+        warmup_calls=warmup[0] if warmup is not None else None,
+        warmup_converged=warmup[1] if warmup is not None else None,
+        peak_bytes=memory.peak_bytes if memory is not None else None,
+        retained_bytes=memory.retained_bytes if memory is not None else None,
+        **({f'resources_{field.name}': getattr(resources, field.name) for field in dataclasses.fields(resources)} if resources is not None else {}),
+        cpu_ratio=resources.cpu_ratio if resources is not None else None,
+        concurrency=async_measurement.concurrency if async_measurement is not None else None,
+        throughput_awaits_per_s=async_measurement.throughput if async_measurement is not None else None,
+        relative_ci_width=precision.relative_ci_width if precision is not None else None,
+        target_precision=precision.target if precision is not None else None,
+        adaptive_stop=precision.stop.name if precision is not None else None,
+    )
+
+class JsonLinesReporter(_FileReporter):
+    """
+    Writes each event as a line of JSON object with an "event" key, without colours.
+    """
+    def _write(self, event: str, **fields) -> None:
+        self.file.write(json.dumps(dict(event=event, **fields)) + '\n')
+
+    def run_started(self, python: str, gil_enabled: bool) -> None:
+        self._write('run_started', python=python, gil_enabled=gil_enabled)
+
+    def testcase_started(self, runcase: int, testcase_index: int, formatted_args: tuple[list[tuple[str, str]], tuple[str, str]], repeats: int) -> None:
+        args, expected = formatted_args
+        self._write('testcase_started', runcase=runcase, testcase=testcase_index, repeats=repeats, args={name.strip(): value for name, value in args}, expected=expected[1])
+
+    def func_measured(self, runcase: int, testcase_index: int, func: typing.Callable, times: ExecTimes, passed: bool) -> None:
+        self._write('func_measured', runcase=runcase, testcase=testcase_index, **_func_record(times, func, passed))
+
+    def summary_ready(self, runcase: int, testcase_index: int, result_texts: dict[typing.Callable, str], times: ExecTimes, passed: dict[typing.Callable, bool]) -> None:
+        self._write('summary_ready', runcase=runcase, testcase=testcase_index, repeats=times._repeats, rank_by=times._rank_by,
+                    ranking=[_func_name(func) for func in times.exec_times_sorted_funcs])
+
+    def run_finished(self, results: list[tuple[int, ExecTimes]]) -> None:
+        self._write('run_finished', runcases=len(results))
+        super().run_finished(results)
+
+class CsvReporter(_FileReporter):
+    """
+    Writes a row for each measured function of each run case, with a header row.
+    """
+    COLUMNS = ('runcase', 'testcase', 'func', 'passed', 'batch_size', 'samples', 'calls', *(f'{name}_ns' for name in stats.STATISTICS), 'gc_collections', 'gc_ns', 'peak_bytes',
+               'cpu_ratio', 'resources_involuntary_switches', 'resources_minor_faults', 'resources_major_faults', 'resources_max_rss_bytes', 'resources_noisy_samples', 'resources_discarded_samples',
+               'relative_ci_width', 'target_precision', 'adaptive_stop')
+
+    def __init__(self, file: str | typing.TextIO = sys.stdout):
+        super().__init__(file)
+        self._writer = None
+
+    def func_measured(self, runcase: int, testcase_index: int, func: typing.Callable, times: ExecTimes, passed: bool) -> None:
+        if self._writer is None:
+            self._writer = csv.DictWriter(self.file, fieldnames=self.COLUMNS, extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow(dict(runcase=runcase, testcase=testcase_index, **_func_record(times, func, passed)))
+
+    def run_finished(self, results: list[tuple[int, ExecTimes]]) -> None:
+        self._writer = None
+        super().run_finished(results)
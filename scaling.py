@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+    scaling.py
+
+Input-size scaling benchmarks: times functions over geometrically growing input sizes,
+fits empirical complexity models and finds the sizes where one function overtakes another.
+"""
+from __future__ import annotations
+
+import dataclasses
+import functools
+import math
+import typing
+
+from tests import time_funcs_testcases, as_funcs
+import human_friendly
+
+
+# {name: f(n)}; each model is t(n) = intercept + coefficient * f(n), except O(1) which is t(n) = intercept.
+COMPLEXITY_MODELS = {
+    'O(1)': None,
+    'O(log n)': lambda n: math.log2(n),
+    'O(n)': lambda n: n,
+    'O(n log n)': lambda n: n * math.log2(n),
+    'O(n^2)': lambda n: n * n,
+}
+
+@dataclasses.dataclass(frozen=True)
+class ComplexityFit:
+    """
+    A least-squares fit of t(n) = intercept_ns + coefficient_ns * f(n), where f is COMPLEXITY_MODELS[name].
+
+    relative_rms_error is the root mean square of (t_fit - t) / t over the measured sizes;
+    fits are made on relative errors, so that small sizes are not outweighed by large ones.
+    """
+    name: str
+    intercept_ns: float
+    coefficient_ns: float
+    relative_rms_error: float
+
+    def predict(self, n: float) -> float:
+        model = COMPLEXITY_MODELS[self.name]
+        return self.intercept_ns + (self.coefficient_ns * model(n) if model is not None else 0.0)
+
+    def text(self) -> str:
+        intercept = human_friendly.seconds(self.intercept_ns / 10**9, decimal_precision=4)
+        if COMPLEXITY_MODELS[self.name] is None:
+            formula = intercept
+        else:
+            f_text = self.name[2:-1]
+            formula = f'{intercept} + {human_friendly.seconds(self.coefficient_ns / 10**9, decimal_precision=4)} * {f_text}'
+        return f'{self.name:10} t(n) = {formula} (relative RMS error: {self.relative_rms_error:.2%})'
+
+    def __str__(self):
+        return self.text()
+
+def geometric_sizes(min_size: int = 10, max_size: int = 10**7, steps_per_decade: int = 1) -> list[int]:
+    """
+    Returns: Distinct input sizes from :min_size: to :max_size:, spaced evenly on a log scale with :steps_per_decade: sizes per factor of 10.
+    """
+    steps = round(math.log10(max_size / min_size) * steps_per_decade)
+    return sorted({round(min_size * 10**(step / steps_per_decade)) for step in range(steps + 1)} | {max_size})
+
+def _fit_model(name: str, sizes: typing.Sequence[int], times_ns: typing.Sequence[float]) -> ComplexityFit:
+    """
+    Weighted least squares with weights 1 / t^2, i.e. least squares on relative errors; solved in closed form.
+    Models of which best coefficient is negative are fitted with coefficient 0.
+    """
+    weights = [1 / t**2 for t in times_ns]
+    model = COMPLEXITY_MODELS[name]
+
+    def intercept_only():
+        return sum(w * t for w, t in zip(weights, times_ns)) / sum(weights), 0.0
+
+    if model is None:
+        intercept, coefficient = intercept_only()
+    else:
+        xs = [model(n) for n in sizes]
+        sw = sum(weights)
+        swx = sum(w * x for w, x in zip(weights, xs))
+        swy = sum(w * t for w, t in zip(weights, times_ns))
+        swxx = sum(w * x * x for w, x in zip(weights, xs))
+        swxy = sum(w * x * t for w, x, t in zip(weights, xs, times_ns))
+        determinant = sw * swxx - swx * swx
+        if determinant == 0:
+            intercept, coefficient = intercept_only()
+        else:
+            coefficient = (sw * swxy - swx * swy) / determinant
+            intercept = (swy - coefficient * swx) / sw
+            if coefficient < 0:
+                intercept, coefficient = intercept_only()
+
+    fit = ComplexityFit(name, intercept, coefficient, 0.0)
+    rms = math.sqrt(sum(((fit.predict(n) - t) / t)**2 for n, t in zip(sizes, times_ns)) / len(sizes))
+    return dataclasses.replace(fit, relative_rms_error=rms)
+
+def fit_complexity(sizes: typing.Sequence[int], times_ns: typing.Sequence[float]) -> list[ComplexityFit]:
+    """
+    Fits all of COMPLEXITY_MODELS to execution times :times_ns: measured at input sizes :sizes:.
+
+    Returns: A list of ComplexityFit, in ascending order of relative RMS error; the first one is the best fit.
+        When errors are equal within 1%, the simpler model is preferred.
+    """
+    if len(sizes) != len(times_ns) or len(sizes) < 2:
+        raise ValueError(f'At least two (size, time) pairs are required. (Given: {len(sizes)} sizes, {len(times_ns)} times)')
+
+    fits = sorted((_fit_model(name, sizes, [max(t, 1e-3) for t in times_ns]) for name in COMPLEXITY_MODELS), key=lambda fit: fit.relative_rms_error)
+    order = list(COMPLEXITY_MODELS)
+    close_fits = sorted((fit for fit in fits if fit.relative_rms_error <= fits[0].relative_rms_error + 0.01), key=lambda fit: order.index(fit.name))
+    return close_fits + [fit for fit in fits if fit not in close_fits]
+
+def crossover_sizes(fit_a: ComplexityFit, fit_b: ComplexityFit, min_size: float, max_size: float, points_per_decade: int = 50) -> list[float]:
+    """
+    Returns: Sizes in [:min_size:, :max_size:] where predicted times of :fit_a: and :fit_b: cross.
+    """
+    def difference(n):
+        return fit_a.predict(n) - fit_b.predict(n)
+
+    points = max(2, int(math.log10(max_size / min_size) * points_per_decade) + 1)
+    grid = [min_size * (max_size / min_size)**(i / (points - 1)) for i in range(points)]
+    crossings = []
+    for lower, upper in zip(grid, grid[1:]):
+        if (difference(lower) < 0) != (difference(upper) < 0):
+            # Bisection on log scale
+            for _ in range(50):
+                middle = math.sqrt(lower * upper)
+                if (difference(lower) < 0) == (difference(middle) < 0):
+                    lower = middle
+                else:
+                    upper = middle
+            crossings.append(math.sqrt(lower * upper))
+
+    return crossings
+
+def _same_func(a: typing.Callable, b: typing.Callable) -> bool:
+    """
+    Functions measured in other processes come back as equal but not identical objects (e.g. functools.partial).
+    """
+    if a is b:
+        return True
+    a, b = (f.func if isinstance(f, functools.partial) else f for f in (a, b))
+    return (getattr(a, '__module__', None), getattr(a, '__qualname__', None)) == (getattr(b, '__module__', None), getattr(b, '__qualname__', None))
+
+def time_funcs_scaling(funcs: tuple[typing.Callable] | typing.Callable, generate_args: typing.Callable[[int], tuple], sizes: typing.Optional[typing.Sequence[int]] = None, ref_func: typing.Optional[typing.Callable] = None, repeats: typing.Optional[typing.Callable[[int], int]] = None, **time_funcs_options) -> tuple[dict[typing.Callable, list[ComplexityFit]], list[tuple[typing.Callable, typing.Callable, float]]]:
+    """
+    Times :funcs: at each input size with tests.time_funcs_testcases(), fits complexity models, and prints a scaling report.
+
+    Args:
+        generate_args: A function returning a tuple of arguments for input size n, called just before the size is timed.
+        sizes: Input sizes. Defaults to geometric_sizes(), i.e. 10, 100, ..., 10**7.
+        ref_func: A function computing the expected return for each testcase. Defaults to the first of :funcs:.
+        repeats: A function returning the number of repeats for input size n.
+            Defaults to 10**7 // n, clamped to [3, 10,000]; reduce :sizes: for functions slower than O(n log n).
+        time_funcs_options: Keyword arguments passed to tests.time_funcs_testcases(), e.g. batch_size, workers.
+
+    Returns: A tuple of
+        - {func: a list of ComplexityFit, the best first}, and
+        - a list of crossovers (func overtaking, func overtaken, size), where the first becomes faster than the second for larger sizes.
+    """
+    funcs = as_funcs(funcs)
+    sizes = sorted(sizes) if sizes is not None else geometric_sizes()
+    ref_func = ref_func if ref_func is not None else funcs[0]
+    if repeats is None:
+        repeats = lambda n: min(max(10**7 // n, 3), 10_000)
+
+    def testcases():
+        # Generated just before each size is timed, so that only testcases in flight are kept in memory.
+        for n in sizes:
+            args = generate_args(n)
+            yield args, ref_func(*args)
+
+    results = time_funcs_testcases(funcs, testcases(), repeats={index: repeats(n) for index, n in enumerate(sizes)}, **time_funcs_options)
+
+    measured_sizes = [sizes[testcase_index] for testcase_index, _ in results]
+    fits = {}
+    for func in funcs:
+        times_ns = [times.statistic(next(f for f in times._times if _same_func(f, func))) for _, times in results]
+        fits[func] = fit_complexity(measured_sizes, times_ns)
+
+    crossovers = []
+    for i, func_a in enumerate(funcs):
+        for func_b in funcs[i + 1:]:
+            for n in crossover_sizes(fits[func_a][0], fits[func_b][0], measured_sizes[0], measured_sizes[-1]):
+                # The function of which predicted time grows slower overtakes the other beyond n.
+                faster, slower = (func_a, func_b) if fits[func_a][0].predict(n * 2) < fits[func_b][0].predict(n * 2) else (func_b, func_a)
+                crossovers.append((faster, slower, n))
+
+    for line in scaling_summary(fits, crossovers, measured_sizes):
+        print(line)
+    print()
+
+    return fits, crossovers
+
+def scaling_summary(fits: dict[typing.Callable, list[ComplexityFit]], crossovers: list[tuple[typing.Callable, typing.Callable, float]], sizes: typing.Sequence[int]) -> list[str]:
+    def name(func):
+        func = func.func if isinstance(func, functools.partial) else func
+        return f'{func.__module__}.{func.__name__}'
+
+    max_name_length = max(map(lambda f: len(name(f)), fits.keys()))
+    lines = [f'Scaling: (sizes: {sizes[0]:,} ... {sizes[-1]:,}, {len(sizes)} sizes)']
+    for func, func_fits in fits.items():
+        runner_up = f' (next: {func_fits[1].name}, {func_fits[1].relative_rms_error:.2%})' if len(func_fits) > 1 else ''
+        lines.append(f' - {name(func):{max_name_length}}: {func_fits[0]}{runner_up}')
+
+    if len(crossovers) > 0:
+        lines.append('Crossovers:')
+        for faster, slower, n in sorted(crossovers, key=lambda t: t[2]):
+            lines.append(f' - {name(faster)} overtakes {name(slower)} at n ~ {n:,.0f}')
+
+    return lines
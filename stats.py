@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+    stats.py
+
+Descriptive statistics and bootstrap confidence intervals for timing samples.
+NumPy is used if it is installed; otherwise pure-Python implementations are used.
+"""
+from __future__ import annotations
+
+import math
+import random
+import statistics
+import typing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Names of the statistics supported by statistic(), describe() and bootstrap_ci().
+STATISTICS = ('min', 'median', 'mean', 'p95', 'p99', 'max', 'stddev')
+
+def percentile(sorted_values: typing.Sequence[float], q: float) -> float:
+    """
+    Returns: :q:-th percentile (0 <= :q: <= 100) of :sorted_values: with linear interpolation, same as numpy.percentile().
+    """
+    if len(sorted_values) == 0:
+        return math.nan
+
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def _stddev(values: typing.Sequence[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    mean = math.fsum(values) / len(values)
+    return math.sqrt(math.fsum((value - mean)**2 for value in values) / (len(values) - 1))
+
+_STATISTIC_FUNCS = {
+    # Functions take sorted values.
+    'min': lambda values: values[0] if len(values) > 0 else math.nan,
+    'median': lambda values: percentile(values, 50),
+    'mean': lambda values: math.fsum(values) / len(values) if len(values) > 0 else math.nan,
+    'p95': lambda values: percentile(values, 95),
+    'p99': lambda values: percentile(values, 99),
+    'max': lambda values: values[-1] if len(values) > 0 else math.nan,
+    'stddev': _stddev,
+}
+
+_NUMPY_STATISTIC_FUNCS = {
+    # Functions reduce a 2-d array along axis 1.
+    'min': lambda values: values.min(axis=1),
+    'median': lambda values: numpy.median(values, axis=1),
+    'mean': lambda values: values.mean(axis=1),
+    'p95': lambda values: numpy.percentile(values, 95, axis=1),
+    'p99': lambda values: numpy.percentile(values, 99, axis=1),
+    'max': lambda values: values.max(axis=1),
+    'stddev': lambda values: values.std(axis=1, ddof=1) if values.shape[1] > 1 else numpy.zeros(values.shape[0]),
+}
+
+def _check_statistic(name: str) -> None:
+    if name not in STATISTICS:
+        raise ValueError(f'Invalid statistic: {name}; must be among {list(STATISTICS)}')
+
+def statistic(values: typing.Iterable[float], name: str) -> float:
+    """
+    Returns: Statistic :name: (one of STATISTICS) of :values:.
+    """
+    _check_statistic(name)
+    return _STATISTIC_FUNCS[name](sorted(values))
+
+def describe(values: typing.Iterable[float]) -> dict[str, float]:
+    """
+    Returns: A dictionary of {statistic name: value} for all of STATISTICS.
+    """
+    sorted_values = sorted(values)
+    return {name: _STATISTIC_FUNCS[name](sorted_values) for name in STATISTICS}
+
+def bootstrap_ci(values: typing.Sequence[float], name: str = 'median', confidence: float = 0.95, resamples: int = 1000, seed: typing.Optional[int] = 0) -> tuple[float, float]:
+    """
+    Percentile bootstrap confidence interval of statistic :name: of :values:.
+
+    Args:
+        confidence: Confidence level in (0, 1).
+        resamples: Number of bootstrap resamples.
+            The pure-Python fallback sorts every resample, so keep it small for large samples if NumPy is not installed.
+        seed: Seed of the resampling random number generator; the same seed gives the same interval.
+
+    Returns: A tuple of (lower, upper).
+    """
+    _check_statistic(name)
+    if not 0 < confidence < 1:
+        raise ValueError(f'confidence must be in (0, 1). (Given: {confidence})')
+    if len(values) == 0:
+        return (math.nan, math.nan)
+
+    alpha = (1 - confidence) / 2
+    if numpy is not None:
+        array = numpy.asarray(values, dtype=numpy.float64)
+        rng = numpy.random.default_rng(seed)
+        # Resample in chunks to bound memory to about 32 MiB.
+        chunk = max(1, (1 << 22) // len(array))
+        estimates = numpy.concatenate([
+            _NUMPY_STATISTIC_FUNCS[name](array[rng.integers(0, len(array), (min(chunk, resamples - start), len(array)))])
+            for start in range(0, resamples, chunk)
+        ])
+        lower, upper = numpy.percentile(estimates, [alpha * 100, (1 - alpha) * 100])
+        return (float(lower), float(upper))
+
+    rng = random.Random(seed)
+    func = _STATISTIC_FUNCS[name]
+    estimates = sorted(func(sorted(rng.choices(values, k=len(values)))) for _ in range(resamples))
+    return (percentile(estimates, alpha * 100), percentile(estimates, (1 - alpha) * 100))
+
+# Quantiles of the statistics of which quick_ci() gives distribution-free intervals from order statistics.
+_QUANTILES = {'median': 0.5, 'p95': 0.95, 'p99': 0.99}
+
+def quick_ci(values: typing.Sequence[float], name: str = 'median', confidence: float = 0.95, resamples: int = 200, weights: typing.Optional[typing.Sequence[float]] = None) -> tuple[float, float]:
+    """
+    A confidence interval of statistic :name: of :values: cheap enough to compute repeatedly while sampling.
+    Intervals of quantiles (median, p95, p99) are distribution-free, between order statistics around the quantile's rank
+    (normal approximation of the binomial distribution); that of the mean is the normal approximation.
+    Other statistics fall back to bootstrap_ci() with :resamples: resamples.
+
+    Args:
+        weights: Weights of :values: for the mean (e.g. numbers of calls of samples of per-call times), of which interval is then
+            that of the weighted mean, with the standard error of a ratio estimator. Ignored for other statistics.
+
+    Returns: A tuple of (lower, upper); (nan, nan) for fewer than 2 values.
+    """
+    _check_statistic(name)
+    if not 0 < confidence < 1:
+        raise ValueError(f'confidence must be in (0, 1). (Given: {confidence})')
+    n = len(values)
+    if n < 2:
+        return (math.nan, math.nan)
+
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    if name in _QUANTILES:
+        q = _QUANTILES[name]
+        sorted_values = sorted(values)
+        spread = z * math.sqrt(n * q * (1 - q))
+        lower = max(math.floor(n * q - spread) - 1, 0)
+        upper = min(math.ceil(n * q + spread), n - 1)
+        return (sorted_values[lower], sorted_values[upper])
+    if (name == 'mean') and (weights is not None):
+        total_weight = math.fsum(weights)
+        mean = math.fsum(weight * value for weight, value in zip(weights, values)) / total_weight
+        standard_error = math.sqrt(n / (n - 1) * math.fsum((weight * (value - mean))**2 for weight, value in zip(weights, values))) / total_weight
+        return (mean - z * standard_error, mean + z * standard_error)
+    if name == 'mean':
+        mean = math.fsum(values) / n
+        half_width = z * _stddev(values) / math.sqrt(n)
+        return (mean - half_width, mean + half_width)
+    return bootstrap_ci(values, name, confidence=confidence, resamples=resamples)
+
+# Largest product of sample sizes for which mann_whitney_u() computes the exact p-value.
+_MANN_WHITNEY_EXACT_MAX = 400
+
+def _mann_whitney_exact_p(u: float, n1: int, n2: int) -> float:
+    """
+    Returns: Two-sided exact p-value of U statistic :u: without ties, from the number of arrangements of each U value.
+    """
+    # counts[m][k] is the number of arrangements of m values of the first sample and the current number of the second with U = k.
+    counts = [[1] + [0] * (n1 * n2) for _ in range(n1 + 1)]
+    for j in range(1, n2 + 1):
+        updated = [[1] + [0] * (n1 * n2)]
+        for m in range(1, n1 + 1):
+            # The largest value is either from the second sample (U unchanged) or the first (adds j to U).
+            row = [counts[m][k] + (updated[m - 1][k - j] if k >= j else 0) for k in range(n1 * n2 + 1)]
+            updated.append(row)
+        counts = updated
+
+    distribution = counts[n1]
+    total = sum(distribution)
+    u_low = min(u, n1 * n2 - u)
+    p = 2 * sum(distribution[:math.floor(u_low) + 1]) / total
+    return min(p, 1.0)
+
+def mann_whitney_u(x: typing.Sequence[float], y: typing.Sequence[float]) -> tuple[float, float]:
+    """
+    Mann-Whitney U test of whether values of :x: and :y: come from the same distribution, without assuming normality.
+
+    The p-value is exact for small samples without ties; otherwise the normal approximation with tie and continuity corrections is used.
+
+    Returns: A tuple of (U statistic of :x:, two-sided p-value).
+        U is n1 * n2 / 2 when neither tends to be larger; a larger U means values of :x: tend to be larger.
+    """
+    n1, n2 = len(x), len(y)
+    if (n1 == 0) or (n2 == 0):
+        return (math.nan, math.nan)
+
+    # Ranks of the pooled values; tied values get the average of their ranks.
+    pooled = sorted([(value, 0) for value in x] + [(value, 1) for value in y])
+    rank_sum_x = 0.0
+    tie_term = 0
+    has_ties = False
+    start = 0
+    while start < len(pooled):
+        end = start
+        while (end + 1 < len(pooled)) and (pooled[end + 1][0] == pooled[start][0]):
+            end += 1
+        average_rank = (start + end) / 2 + 1
+        rank_sum_x += average_rank * sum(1 for _, sample in pooled[start:end + 1] if sample == 0)
+        ties = end - start + 1
+        if ties > 1:
+            has_ties = True
+            tie_term += ties**3 - ties
+        start = end + 1
+
+    u = rank_sum_x - n1 * (n1 + 1) / 2
+    if (not has_ties) and (n1 * n2 <= _MANN_WHITNEY_EXACT_MAX):
+        return (u, _mann_whitney_exact_p(u, n1, n2))
+
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return (u, 1.0)
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return (u, min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2))))
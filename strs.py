@@ -3,37 +3,155 @@
     strutil.py
 """
 
+import array
+import itertools
+import re
 import sys
 # import unicodedata
 
 import colorama
 
 
-def fitlength(s, maxlen=sys.maxsize, ommission_text = '...'):
+def fitlength(s, maxlen=sys.maxsize, ommission_text = '...', prefix=''):
     """
     Fits string length to the given length.
 
-    :params: s: A string.
+    :params: s: A string, or any object to be converted by str().
+        Lists, tuples, dicts, array.arrays and strings inside them are rendered lazily (see iter_str_chunks()),
+        so that only as many elements as needed for :maxlen: characters are converted, however large :s: is.
     :params: maxlen: Maximum length for the fitted string.
     :params: ommission_text: The text to be inserted to indicate ommitted parts.
+    :params: prefix: A string prepended to str(s) before fitting.
 
     :returns: A string of which length is fitted accordingly.
     """
 
+    # maxlen == start_len + len('...') + len(middle part) + len('...') + end_len
+    # start_len == len(middle part) == end_len ~= (maxlen - len('...') * 2) / 3
+    segments_length = (maxlen - len(ommission_text) * 2) // 3
+
+    if (type(s) is not str) and (type(s) in _LAZY_STR_TYPES) and (segments_length > 0):
+        # Only the first (maxlen + 1) characters, which include the middle part, and the last segments_length characters are rendered.
+        head = _take_chars(itertools.chain([prefix], iter_str_chunks(s)), maxlen + 1)
+        if len(head) <= maxlen:
+            return head
+        tail = _take_chars(itertools.chain(iter_str_chunks(s, reverse=True), [prefix]), segments_length, reverse=True)
+        return ommission_text.join([head[:segments_length], head[(maxlen - segments_length) // 2:(maxlen + segments_length) // 2], tail])
+
     if type(s) is not str:
         s = str(s)
+    s = prefix + s
 
     if len(s) <= maxlen:
         return s
 
-    # maxlen == start_len + len('...') + len(middle part) + len('...') + end_len
-    # start_len == len(middle part) == end_len ~= (maxlen - len('...') * 2) / 3
-    segments_length = (maxlen - len(ommission_text) * 2) // 3
     return ommission_text.join([s[:segments_length], s[(maxlen - segments_length) // 2:(maxlen + segments_length) // 2], s[-segments_length:]])
 
+_LAZY_STR_TYPES = (list, tuple, dict, array.array)
+_STR_CHUNK_LENGTH = 256
+
+def _take_chars(chunks, n, reverse=False):
+    """
+    Returns: The first :n: characters of the concatenation of :chunks: (or all, if shorter),
+        or the last :n: characters if :reverse:, where :chunks: are in reverse order.
+    """
+    taken = []
+    length = 0
+    for chunk in chunks:
+        taken.append(chunk)
+        length += len(chunk)
+        if length >= n:
+            break
+
+    if reverse:
+        return ''.join(reversed(taken))[-n:] if length > 0 else ''
+    return ''.join(taken)[:n]
+
+def _str_repr_chunks(s, reverse):
+    """
+    Yields repr(s) in chunks, escaping only the chunks consumed.
+    """
+    if len(s) <= _STR_CHUNK_LENGTH:
+        yield repr(s)
+        return
+
+    # Same quote as repr(s); the sentinels appended to each chunk make repr() choose it and escape quotes the same way.
+    if ("'" in s) and ('"' not in s):
+        quote, sentinel = '"', "'"
+    else:
+        quote, sentinel = "'", '\'"'
+    sentinel_length = len(repr(sentinel)) - 2
+
+    starts = range(0, len(s), _STR_CHUNK_LENGTH)
+    yield quote
+    for start in (reversed(starts) if reverse else starts):
+        yield repr(s[start:start + _STR_CHUNK_LENGTH] + sentinel)[1:-1 - sentinel_length]
+    yield quote
+
+def iter_str_chunks(value, reverse=False, _active=frozenset()):
+    """
+    Yields str(value) in chunks, rendering elements of lists, tuples, dicts and array.arrays (and their nested ones) one by one as consumed.
+
+    :params: reverse: If True, chunks are yielded from the end.
+    """
+    type_ = type(value)
+    if type_ not in _LAZY_STR_TYPES:
+        # Also NumPy arrays, of which str() summarizes large ones
+        yield str(value)
+        return
+
+    if id(value) in _active:
+        # A recursive reference
+        yield '{...}' if type_ is dict else '[...]'
+        return
+    _active = _active | {id(value)}
+
+    def element_chunks(element):
+        if type(element) is str:
+            return _str_repr_chunks(element, reverse)
+        if type(element) in _LAZY_STR_TYPES:
+            return iter_str_chunks(element, reverse, _active)
+        return [repr(element)]
+
+    if type_ is dict:
+        opening, closing = '{', '}'
+        items = reversed(value.items()) if reverse else value.items()
+        elements = ((element_chunks(k), [': '], element_chunks(v)) for k, v in items)
+        if reverse:
+            elements = (reversed(parts) for parts in elements)
+    else:
+        if type_ is list:
+            opening, closing = '[', ']'
+        elif type_ is tuple:
+            opening, closing = '(', ',)' if len(value) == 1 else ')'
+        elif len(value) > 0:
+            opening, closing = f'array({value.typecode!r}, [', '])'
+        else:
+            opening, closing = f'array({value.typecode!r}', ')'
+        elements = ((element_chunks(element),) for element in (reversed(value) if reverse else value))
+
+    if reverse:
+        opening, closing = closing, opening
+
+    yield opening
+    for i, parts in enumerate(elements):
+        if i > 0:
+            yield ', '
+        for part in parts:
+            yield from part
+    yield closing
+
 def colorize(s, color):
     return f'{color}{s}{colorama.Style.RESET_ALL}'
 
+_ANSI_ESCAPE_PATTERN = re.compile(r'\x1b\[[0-9;]*m')
+
+def visible_len(s):
+    """
+    Returns: Length of :s: excluding ANSI color escape sequences.
+    """
+    return len(_ANSI_ESCAPE_PATTERN.sub('', s))
+
 def append_lateral_lines(lines, insert_index, append_lines, lateral_spaces=5):
     """
     Inserts append_lines laterally to lines beginning from the insert_index'th line.
@@ -50,9 +168,9 @@ def append_lateral_lines(lines, insert_index, append_lines, lateral_spaces=5):
     for _ in range(insert_index + len(append_lines) - len(lines)):
         lines.append('')
 
-    table_start_position = max(map(len, lines[insert_index:insert_index + len(append_lines)])) + lateral_spaces
+    table_start_position = max(map(visible_len, lines[insert_index:insert_index + len(append_lines)])) + lateral_spaces
     for i in range(len(append_lines)):
-        lines[insert_index + i] = lines[insert_index + i] + ' ' * (table_start_position - len(lines[insert_index + i])) + append_lines[i]
+        lines[insert_index + i] = lines[insert_index + i] + ' ' * (table_start_position - visible_len(lines[insert_index + i])) + append_lines[i]
 
     return lines
 
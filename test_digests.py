@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+    test_digests.py
+
+Tests of digests.py; run with `python -m unittest` or pytest.
+"""
+import array
+import decimal
+import fractions
+import unittest
+
+from digests import ValueDigest, value_digest
+from tests import values_equal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SequenceDigestTest(unittest.TestCase):
+    def test_tuple_matches_list(self):
+        self.assertEqual(value_digest((1, 2.5, 'a')), value_digest([1, 2.5, 'a']))
+        self.assertEqual(value_digest(((1, 2), (3, 4))), value_digest([[1, 2], [3, 4]]))
+        self.assertNotEqual(value_digest((1, 2)), value_digest([1, 2, 3]))
+
+    def test_tuple_matches_array(self):
+        self.assertTrue(values_equal((1, 2, 3), array.array('q', [1, 2, 3])))
+        self.assertEqual(value_digest((1, 2, 3)), value_digest(array.array('q', [1, 2, 3])))
+        self.assertEqual(value_digest((1, 2, 3)), value_digest(memoryview(array.array('q', [1, 2, 3]))))
+
+    @unittest.skipUnless(numpy is not None, 'requires NumPy')
+    def test_tuple_matches_ndarray(self):
+        expected = numpy.array([[1.5, 2.0], [3.0, 4.5]])
+        actual = ((1.5, 2.0), (3.0, 4.5))
+        self.assertTrue(values_equal(actual, expected))
+        self.assertTrue(ValueDigest.of(expected).matches(actual))
+        self.assertNotEqual(value_digest(numpy.zeros((0, 3))), value_digest(()))
+
+    def test_equal_numbers(self):
+        digest = value_digest(1)
+        for number in (1.0, True, decimal.Decimal(1), fractions.Fraction(1), complex(1, 0)):
+            self.assertEqual(value_digest(number), digest, number)
+        self.assertEqual(value_digest(fractions.Fraction(1, 2)), value_digest(0.5))
+        self.assertEqual(value_digest([1, 2**70, 0.5]), value_digest((1.0, 2**70, fractions.Fraction(1, 2))))
+
+    def test_bytes_like(self):
+        self.assertEqual(value_digest(b'ab'), value_digest(bytearray(b'ab')))
+        self.assertNotEqual(value_digest(b'ab'), value_digest('ab'))
+
+if __name__ == '__main__':
+    unittest.main()
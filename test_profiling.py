@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+    test_profiling.py
+
+Tests of profiling.py; run with `python -m unittest` or pytest.
+"""
+import sys
+import unittest
+
+import profiling
+
+
+def sum_of_genexpr(data):
+    return sum(x * 2 for x in data)
+
+def sum_of_generator(data):
+    def squares():
+        for x in data:
+            y = x * x
+            yield y
+    return sum(squares())
+
+@unittest.skipUnless(hasattr(sys, 'monitoring'), 'line-level times require sys.monitoring, Python 3.12+')
+class GeneratorLineSharesTest(unittest.TestCase):
+    def assert_line_shares_complete(self, func):
+        profile = profiling.profile_func(func, list(range(2000)), min_ns=50_000_000)
+        self.assertEqual(profile.collector, 'sys.monitoring')
+        share = sum(line.time_ns for line in profile.lines) / profile.total_ns
+        self.assertAlmostEqual(share, 1.0, delta=0.05)
+
+    def test_genexpr(self):
+        # A genexpr on a single line gets no LINE event after it is resumed.
+        self.assert_line_shares_complete(sum_of_genexpr)
+
+    def test_generator(self):
+        self.assert_line_shares_complete(sum_of_generator)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,17 +4,74 @@
 """
 from __future__ import annotations
 
+import array
+import collections.abc
+import concurrent.futures
+import contextlib
+import copy
 import dataclasses
 import functools
+import math
 import platform
+import sys
 import typing
 from typing import List
 
 import colorama
 
-from timer import exec_times
+from timer import exec_times, ExecTimes, _exec_times_isolated, call_func
 from strs import fitlength, colorize
 from iterable import get_dims
+from digests import ValueDigest, value_digest
+from pools import process_pool, pool_context, pool_window, submitted_ahead
+from reporters import Reporter, ConsoleReporter, DeferredReporter, print_formatted_args
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _is_array(value: typing.Any) -> bool:
+    return isinstance(value, (memoryview, array.array)) or ((numpy is not None) and isinstance(value, numpy.ndarray))
+
+def _all_close(actual: typing.Any, expected: typing.Any, rtol: float, atol: float) -> bool:
+    if isinstance(actual, (list, tuple)) and isinstance(expected, (list, tuple)):
+        return (len(actual) == len(expected)) and all(_all_close(a, e, rtol, atol) for a, e in zip(actual, expected))
+    if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
+        return math.isclose(actual, expected, rel_tol=rtol, abs_tol=atol) or (math.isnan(actual) and math.isnan(expected))
+    return actual == expected
+
+def values_equal(actual: typing.Any, expected: typing.Any, rtol: float = 0.0, atol: float = 0.0) -> bool:
+    """
+    Compares a function return to an expected one.
+
+    NumPy arrays, memoryviews and array.arrays (on either side, e.g. a vectorised function against a pure-Python reference returning a list)
+    are equal if their shapes are the same and all elements are equal; NaNs are equal to NaNs.
+    If :rtol: or :atol: is given, numbers are compared with tolerance as numpy.allclose() (or math.isclose() for lists without NumPy).
+    """
+    if _is_array(actual) or _is_array(expected):
+        if numpy is not None:
+            try:
+                actual, expected = numpy.asarray(actual), numpy.asarray(expected)
+            except ValueError:
+                # Ragged nested sequences
+                return False
+            if actual.shape != expected.shape:
+                return False
+            if not all(value.dtype.kind in 'biufc' for value in (actual, expected)):
+                return bool(numpy.array_equal(actual, expected))
+            if (rtol == 0) and (atol == 0):
+                return bool(numpy.array_equal(actual, expected, equal_nan=True))
+            return bool(numpy.allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True))
+
+        actual, expected = (value.tolist() if _is_array(value) else value for value in (actual, expected))
+        if (rtol == 0) and (atol == 0):
+            return _all_close(actual, expected, 0.0, 0.0)
+
+    if (rtol == 0) and (atol == 0):
+        return bool(actual == expected)
+    return _all_close(actual, expected, rtol, atol)
 
 
 @dataclasses.dataclass
@@ -23,17 +80,37 @@ class BaseFuncTestcase:
         True: colorize('PASSED', colorama.Fore.GREEN),
         False: colorize('FAILED', colorama.Fore.RED)
     }
+    # Tolerances of values_equal(), for functions returning floats.
+    __RTOL__ = 0.0
+    __ATOL__ = 0.0
+
+    @property
+    def _func_args_object(self):
+        return getattr(self, dataclasses.fields(self)[0].name)
 
     @property
-    def func_args(self):
-        return dataclasses.astuple(self)[0]
+    def func_args(self) -> tuple:
+        """
+        Returns: A tuple of the arguments as stored, without copying them.
+            Functions which modify their arguments in place modify the testcase; use fresh_func_args() for those.
+        """
+        args = self._func_args_object
+        return tuple(getattr(args, field.name) for field in dataclasses.fields(args))
+
+    def fresh_func_args(self) -> tuple:
+        """
+        Returns: A tuple of deep copies of the arguments.
+        """
+        return copy.deepcopy(self.func_args)
 
     @property
     def _expected_func_return(self):
-        return dataclasses.astuple(self)[1]
+        return getattr(self, dataclasses.fields(self)[1].name)
         
     def test(self, func_return):
-        return func_return == self._expected_func_return
+        if isinstance(self._expected_func_return, ValueDigest):
+            return self._expected_func_return.matches(func_return)
+        return values_equal(func_return, self._expected_func_return, rtol=self.__RTOL__, atol=self.__ATOL__)
 
     def func_test_result_text(self, func_return):
         return self.__EVAL_RESULT_TEXTS__[self.test(func_return)]
@@ -49,39 +126,29 @@ class BaseFuncTestcase:
             print(f' - Return  : {fitlength(func_return, maxlen=return_text_maxlen)}')
             print()
 
-    def print_test_result(self, func, print_values=True, return_text_maxlen=200):
-        func_return = func(*self.func_args)
+    def print_test_result(self, func, print_values=True, return_text_maxlen=200, fresh_args=False):
+        func_return = call_func(func, *(self.fresh_func_args() if fresh_args else self.func_args))
         self.print_func_return_test_result(func, func_return, print_values=print_values, return_text_maxlen=return_text_maxlen)
 
     def formatted_args(self, value_maxlen=200) -> List[str]:
         def format_value(value) -> str:
-            if isinstance(value, int):
-                text = format(value, ',d')
-            else:
-                text = str(value)
-
             dims = get_dims(value)
-            if len(dims) > 0:
-                dims_text = ' x '.join(map(str, dims))
-                text = f'[dims: {dims_text}] {text}'
-
-            return text
+            prefix = f'[dims: {" x ".join(map(str, dims))}] ' if len(dims) > 0 else ''
+            # Values other than ints are rendered lazily by fitlength(), however large they are.
+            return fitlength(format(value, ',d') if isinstance(value, int) else value, maxlen=value_maxlen, prefix=prefix)
         
         EXPECTED_NAME = '[Expected]'
 
-        attributes = [(attrname, value) for attrname, value in dataclasses.asdict(getattr(self, dataclasses.fields(self)[0].name)).items()]
+        attributes = [(field.name, getattr(self._func_args_object, field.name)) for field in dataclasses.fields(self._func_args_object)]
         max_name_length = max(*map(len, list(zip(*attributes))[0]), len(EXPECTED_NAME))
         args = []
         for attrname, value in attributes:
-            args.append((format(attrname, f'{max_name_length}s'), fitlength(format_value(value), maxlen=value_maxlen)))
+            args.append((format(attrname, f'{max_name_length}s'), format_value(value)))
 
-        return (args, (format(EXPECTED_NAME, f'{max_name_length}s'), fitlength(format_value(getattr(self, dataclasses.fields(self)[1].name)), maxlen=value_maxlen)))
+        return (args, (format(EXPECTED_NAME, f'{max_name_length}s'), format_value(getattr(self, dataclasses.fields(self)[1].name))))
     
     def print_args(self, value_maxlen=200) -> None:
-        print('* [Arguments] *')
-        for name, value in self.formatted_args(value_maxlen)[0]:
-            print(f'- {name}\t{value}')
-        print('* {}\t{}'.format(*self.formatted_args(value_maxlen)[1]))
+        print_formatted_args(self.formatted_args(value_maxlen))
 
 def descriptor(desc):
     def descriptor_adder(func):
@@ -93,53 +160,151 @@ def descriptor(desc):
 def python_implemntation_text() -> str:
     return f'{platform.python_implementation()} {platform.python_version()} revision {platform.python_revision()}'
 
-def prepare_testcases(testcases: typing.Tuple[BaseFuncTestcase | typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any]]) -> typing.Tuple[BaseFuncTestcase, typing.Any]:
+def gil_enabled() -> bool:
+    """
+    Returns: Whether the GIL is enabled at run time; always True before Python 3.13, which has no free-threaded builds.
+    """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled() if is_gil_enabled is not None else True
+
+def gil_status_text() -> str:
+    return 'GIL enabled' if gil_enabled() else 'GIL disabled'
+
+def _make_testcase_class(testcase: typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any], rtol: float, atol: float, digest_expected: bool) -> tuple[type, type]:
+    """
+    Returns: A tuple of (arguments data class, testcase data class) created from :testcase:.
+        Field types are the types of the values, e.g. numpy.ndarray; arrays are stored as is, not copied.
+        The data classes do not define __eq__, which would compare arrays ambiguously.
+    """
+    if digest_expected and ((rtol != 0) or (atol != 0)):
+        raise ValueError(f'Expected returns cannot be compared with tolerances by digests. (Given: rtol={rtol}, atol={atol})')
+
+    funcargs_class = dataclasses.make_dataclass('FuncArgs', [(f'attr{index}', type(arg)) for index, arg in enumerate(testcase[0])], eq=False)
+    expected_type = ValueDigest if digest_expected else type(testcase[1])
+    testcase_class = dataclasses.make_dataclass('FuncTestcase', [('args', funcargs_class), ('expected', expected_type)], bases=(BaseFuncTestcase,), namespace={'__RTOL__': rtol, '__ATOL__': atol}, eq=False)
+    print(f'Created new testcase data class: {testcase_class.__qualname__}')
+    return funcargs_class, testcase_class
+
+def _new_testcase(testcase_class: type, funcargs_class: type, testcase: typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any], digest_expected: bool) -> BaseFuncTestcase:
+    return testcase_class(funcargs_class(*testcase[0]), ValueDigest.of(testcase[1]) if digest_expected else testcase[1])
+
+def iter_testcases(testcases: typing.Iterable[BaseFuncTestcase | typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any]], rtol: float = 0.0, atol: float = 0.0, digest_expected: bool = False) -> typing.Iterator[BaseFuncTestcase]:
+    """Converts :testcases: to instances of a testcase data class lazily, e.g. while later testcases are still being generated.
+
+    If the first testcase is an instance of a descendent of BaseFuncTestcase, its type will be used as the data class.
+    otherwise, a new appropriate data class will be created from the first testcase and used, comparing returns with tolerances :rtol: and :atol: (see values_equal()).
+    If :digest_expected: is True, the data class keeps a digests.ValueDigest of each expected return instead of the value,
+    so that memory per testcase does not depend on the size of the expected return; returns are compared exactly by digests
+    (see digests.value_digest(), by which a tuple matches a list of equal elements).
+    """
+    testcase_class = None
+    for testcase in testcases:
+        if testcase_class is None:
+            if isinstance(testcase, BaseFuncTestcase):
+                funcargs_class = type(testcase._func_args_object)
+                testcase_class = type(testcase)
+                print(f'Using an existing testcase data class: {type(testcase).__qualname__}')
+            else:
+                funcargs_class, testcase_class = _make_testcase_class(testcase, rtol, atol, digest_expected)
+
+        yield testcase if isinstance(testcase, BaseFuncTestcase) else _new_testcase(testcase_class, funcargs_class, testcase, digest_expected)
+
+def prepare_testcases(testcases: typing.Tuple[BaseFuncTestcase | typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any]], rtol: float = 0.0, atol: float = 0.0, digest_expected: bool = False) -> typing.Tuple[BaseFuncTestcase, typing.Any]:
     """Converts :testcases: to a tuple of a testcase data class.
 
     If a testcase is an instance of a descendent of BaseFuncTestcase, type of the instance encountered first will be used as the data class.
-    otherwise, a new appropriate data class will be created and used.
+    otherwise, a new appropriate data class will be created and used, comparing returns with tolerances :rtol: and :atol: (see values_equal()).
+    See iter_testcases() for :digest_expected:.
+
+    If :testcases: is not a sequence (e.g. a generator), it is converted lazily by iter_testcases().
     """
+    if not isinstance(testcases, collections.abc.Sequence):
+        return iter_testcases(testcases, rtol=rtol, atol=atol, digest_expected=digest_expected)
+
     if len(testcases) > 0:
         for testcase in testcases:
             if isinstance(testcase, BaseFuncTestcase):
-                funcargs_class = type(testcase.func_args)
+                funcargs_class = type(testcase._func_args_object)
                 testcase_class = type(testcase)
                 print(f'Using an existing testcase data class: {type(testcase).__qualname__}')
                 break
         else:
-            funcargs_class = dataclasses.make_dataclass('FuncArgs', [(f'attr{index}', type(arg)) for index, arg in enumerate(testcase[0])])
-            testcase_class = dataclasses.make_dataclass('FuncTestcase', [('args', funcargs_class), ('expected', type(testcase[1]))], bases=(BaseFuncTestcase,))
-            print(f'Created new testcase data class: {testcase_class.__qualname__}')
+            funcargs_class, testcase_class = _make_testcase_class(testcase, rtol, atol, digest_expected)
+
+    return [testcase if isinstance(testcase, BaseFuncTestcase) else _new_testcase(testcase_class, funcargs_class, testcase, digest_expected) for testcase in testcases]
+
+def as_funcs(funcs: tuple[typing.Callable] | typing.Callable) -> tuple[typing.Callable]:
+    try:
+        return tuple(funcs)
+    except TypeError:
+        return (funcs,)
+
+def _call_unit(func: typing.Callable, func_args: tuple) -> typing.Any:
+    # Arguments are unpickled into a fresh copy for each unit.
+    return call_func(func, *func_args)
+
+def _exec_times_unit(func: typing.Callable, func_args: tuple, repeats: int, exec_times_options: dict) -> tuple[ExecTimes, typing.Optional[str]]:
+    """
+    Measures a function for a testcase in a worker process.
 
-    return [testcase if isinstance(testcase, BaseFuncTestcase) else testcase_class(funcargs_class(*testcase[0]),testcase[1]) for testcase in testcases]
+    Returns: A tuple of (ExecTimes, description of :func: set while running, if any).
+    """
+    return _exec_times_isolated(func, func_args, dict(exec_times_options, repeats=repeats))
 
-def run_funcs_testcases(funcs: tuple[typing.Callable] | typing.Callable, testcases: typing.Tuple[BaseFuncTestcase | typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any]], return_text_maxlen: int = 200):
-    testcases = prepare_testcases(testcases)
+def run_funcs_testcases(funcs: tuple[typing.Callable] | typing.Callable, testcases: typing.Tuple[BaseFuncTestcase | typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any]], return_text_maxlen: int = 200, workers: typing.Optional[int | concurrent.futures.Executor] = None, fresh_args: bool = False, rtol: float = 0.0, atol: float = 0.0, digest_expected: bool = False):
+    """
+    Args:
+        fresh_args: If True, each function gets deep copies of the arguments, for functions which modify their arguments in place.
+        rtol, atol: Tolerances for comparing returns to expected ones, e.g. of functions returning NumPy arrays of floats (see values_equal()).
+        digest_expected: If True, testcases keep digests of expected returns instead of the values (see iter_testcases()).
+        workers: If given, (testcase, function) units are run in a process pool; results are printed in the same order as serial runs.
+            Either a number of workers (see pools.process_pool()) or an executor, e.g. one shared with time_funcs_testcases().
+            Functions and testcases must be picklable.
+    """
+    testcases = prepare_testcases(testcases, rtol=rtol, atol=atol, digest_expected=digest_expected)
+    funcs = as_funcs(funcs)
 
     print()
-    print(f'Python Implementation: {python_implemntation_text()}')
+    print(f'Python Implementation: {python_implemntation_text()} ({gil_status_text()})')
     print()
-    for case, testcase in enumerate(testcases, start=1):
-        print(f'----- Test Case {case} -----')
-        testcase.print_args()
-        print()
-
-        try:
-            iter(funcs)
-            for func in funcs:
-                testcase.print_test_result(func, return_text_maxlen=return_text_maxlen)
-        except TypeError:
-            testcase.print_test_result(funcs, return_text_maxlen=return_text_maxlen)
-        
-        print()
 
-def time_funcs_testcases(funcs: tuple[typing.Callable] | typing.Callable, testcases: typing.Tuple[BaseFuncTestcase | typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any]], repeats: int = 1, default_repeats: int = 1, return_text_maxlen: int = 200):
+    with (pool_context(workers) if workers is not None else contextlib.nullcontext()) as pool:
+        submit = (lambda testcase: [pool.submit(_call_unit, func, testcase.func_args) for func in funcs]) if pool is not None else None
+        for case, (testcase, futures) in enumerate(submitted_ahead(testcases, submit, pool_window(pool) if pool is not None else 1), start=1):
+            print(f'----- Test Case {case} -----')
+            testcase.print_args()
+            print()
+
+            for func_index, func in enumerate(funcs):
+                if pool is None:
+                    testcase.print_test_result(func, return_text_maxlen=return_text_maxlen, fresh_args=fresh_args)
+                else:
+                    testcase.print_func_return_test_result(func, futures[func_index].result(), return_text_maxlen=return_text_maxlen)
+            
+            print()
+
+def time_funcs_testcases(funcs: tuple[typing.Callable] | typing.Callable, testcases: typing.Tuple[BaseFuncTestcase | typing.Tuple[typing.Tuple[typing.Any, ...], typing.Any]], repeats: int = 1, default_repeats: int = 1, return_text_maxlen: int = 200, workers: typing.Optional[int | concurrent.futures.Executor] = None, rtol: float = 0.0, atol: float = 0.0, digest_expected: bool = False, history: typing.Optional[typing.Any] = None, reporter: typing.Optional[Reporter] = None, defer_reporting: bool = False, case_time_budget: typing.Optional[float] = None, **exec_times_options):
     """
     Args:
         funcs: A list/tuple of functions to tess.
-        testcases: A list/tuple of testcases.
+        testcases: A list/tuple of testcases, or an iterable producing them lazily (e.g. generation.generate_testcases()).
         runcasese: A dictionary of (testcase index: repeats)
             repeats: Number of repeated runs.
+        workers: If given, each (testcase, function) unit is measured in a process pool.
+            Either a number of workers (see pools.process_pool()) or an executor, e.g. one shared with run_funcs_testcases().
+            Summaries are printed in the same order as serial runs. Functions and testcases must be picklable.
+        rtol, atol: Tolerances for comparing returns to expected ones (see values_equal()).
+        digest_expected: If True, testcases keep digests of expected returns instead of the values (see iter_testcases()).
+        history: A history.BenchmarkHistory to which the run is recorded, with testcases identified by digests of their arguments.
+        reporter: A reporters.Reporter receiving events of the run. Defaults to reporters.ConsoleReporter.
+        defer_reporting: If True, events are queued and reported after all run cases are measured (see reporters.DeferredReporter),
+            so that no output is written between measurements; progress messages of timer.exec_times() are not printed either.
+            Arguments are formatted when events occur, before measuring, so only texts and ExecTimes are kept until the end of the run.
+        case_time_budget: If given, a wall-clock budget in seconds for measuring each run case, shared equally by :funcs:.
+            Sampling is adaptive (see timer.exec_times() time_budget and target_precision); repeats are then maximum numbers of calls.
+        exec_times_options: Keyword arguments passed to timer.exec_times(), e.g. batch_size, or profile=True for hot-spot reports.
+
+    Returns: A list of (testcase index, ExecTimes) of run cases.
 
     Note:
     - If the type of repeats is int:
@@ -150,32 +315,64 @@ def time_funcs_testcases(funcs: tuple[typing.Callable] | typing.Callable, testca
       - If runcases has an entry for a testcase and it is 0, the testcase will be skipped.
       - If runcases does not have an entry for a testcase, it will be run for default_repeats number of times.
     """
-    testcases = prepare_testcases(testcases)
+    testcases = prepare_testcases(testcases, rtol=rtol, atol=atol, digest_expected=digest_expected)
+    funcs = as_funcs(funcs)
 
-    print()
-    print(f'Python Implementation: {python_implemntation_text()}')
-    print()
+    if not isinstance(repeats, (int, dict)):
+        raise TypeError(f'Type of repeats argument must be either int or dict. (Given: {type(repeats)})')
 
-    runcase = 1
-    for testcase_index, testcase in enumerate(testcases):
-        if isinstance(repeats, int):
-            runcase_repeats = repeats
-        elif isinstance(repeats, dict):
-            runcase_repeats = repeats.get(testcase_index, None)
-            if runcase_repeats is None:
-                runcase_repeats = default_repeats
-            elif runcase_repeats == 0:
-                # If runcase repeats is 0, skip this testcase.
-                continue
-        else:
-            raise TypeError(f'Type of repeats argument must be either int or dict. (Given: {type(repeats)})')
-        
-        print(f'----- Run Case [{runcase}]: Test Case [{testcase_index}] x {runcase_repeats:,} iterations -----')
-        testcase.print_args()
-        print()
-        
-        times = exec_times(funcs, *testcase.func_args, repeats=runcase_repeats)
-        times.print_summary({func: testcase.func_test_result_text(func_return) for func, (func_return, _) in times._times.items()})
-        print()
+    if case_time_budget is not None:
+        exec_times_options['time_budget'] = case_time_budget / len(funcs)
+
+    reporter = reporter if reporter is not None else ConsoleReporter()
+    events = DeferredReporter(reporter) if defer_reporting else reporter
+    exec_times_options.setdefault('progress', reporter.progress and not defer_reporting)
+    events.run_started(python_implemntation_text(), gil_enabled())
+
+    def runcases():
+        for testcase_index, testcase in enumerate(testcases):
+            if isinstance(repeats, int):
+                runcase_repeats = repeats
+            else:
+                runcase_repeats = repeats.get(testcase_index, None)
+                if runcase_repeats is None:
+                    runcase_repeats = default_repeats
+                elif runcase_repeats == 0:
+                    # If runcase repeats is 0, skip this testcase.
+                    continue
+            yield testcase_index, testcase, runcase_repeats
+
+    results = []
+    testcase_keys = {}
+    with (pool_context(workers) if workers is not None else contextlib.nullcontext()) as pool:
+        submit = (lambda runcase: [pool.submit(_exec_times_unit, func, runcase[1].func_args, runcase[2], exec_times_options) for func in funcs]) if pool is not None else None
+        for runcase, ((testcase_index, testcase, runcase_repeats), futures) in enumerate(submitted_ahead(runcases(), submit, pool_window(pool) if pool is not None else 1), start=1):
+            events.testcase_started(runcase, testcase_index, testcase.formatted_args(return_text_maxlen), runcase_repeats)
+            if history is not None:
+                # Before measuring, since functions may modify the arguments in place.
+                testcase_keys[testcase_index] = value_digest(testcase.func_args).hex()
+
+            if pool is None:
+                times = exec_times(funcs, *testcase.func_args, repeats=runcase_repeats, **exec_times_options)
+            else:
+                times = ExecTimes(runcase_repeats, **{name: exec_times_options[name] for name in ('rank_by',) if name in exec_times_options})
+                for future in futures:
+                    unit_times, description = future.result()
+                    if description is not None:
+                        for func in unit_times._times:
+                            func.__description__ = description
+                    times.merge(unit_times)
+            passed = {func: testcase.test(func_return) for func, (func_return, _) in times._times.items()}
+            for func, func_passed in passed.items():
+                events.func_measured(runcase, testcase_index, func, times, func_passed)
+            events.summary_ready(runcase, testcase_index, {func: testcase.__EVAL_RESULT_TEXTS__[func_passed] for func, func_passed in passed.items()}, times, passed)
+            results.append((testcase_index, times))
+
+    events.run_finished(results)
+    if defer_reporting:
+        events.flush()
+
+    if history is not None:
+        history.record(results, testcase_keys=testcase_keys)
 
-        runcase += 1
+    return results
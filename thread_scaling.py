@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+    thread_scaling.py
+
+Multi-threaded throughput benchmarks: runs functions concurrently on 1, 2, 4, ... threads,
+and reports throughput and scaling efficiency for each thread count.
+On free-threaded builds (Python 3.13+ with the GIL disabled), this shows which implementations scale and which contend on shared state.
+"""
+from __future__ import annotations
+
+import copy
+import dataclasses
+import functools
+import inspect
+import os
+import statistics
+import threading
+import time
+import typing
+
+from tests import python_implemntation_text, gil_status_text, as_funcs
+from timer import autorange_batch_size
+
+
+# Target duration of the calls of a thread when calls per thread are chosen automatically.
+AUTORANGE_THREAD_NS = 100_000_000
+
+@dataclasses.dataclass(frozen=True)
+class ThreadScalingResult:
+    """
+    Calls of a function made concurrently on :threads: threads, :calls_per_thread: each, which took :elapsed_ns: from the first start to the last end.
+    """
+    threads: int
+    calls_per_thread: int
+    elapsed_ns: int
+
+    @property
+    def ops_per_sec(self) -> float:
+        return self.threads * self.calls_per_thread * 10**9 / self.elapsed_ns if self.elapsed_ns > 0 else float('inf')
+
+    def efficiency(self, baseline: ThreadScalingResult) -> float:
+        """
+        Returns: Throughput per thread relative to that of :baseline: (usually on a single thread); 1.0 is linear scaling.
+        """
+        return (self.ops_per_sec / self.threads) / (baseline.ops_per_sec / baseline.threads)
+
+def thread_counts(max_threads: typing.Optional[int] = None) -> list[int]:
+    """
+    Returns: 1, 2, 4, ... up to :max_threads: (defaults to the number of CPUs available to this process), including :max_threads: itself.
+    """
+    if max_threads is None:
+        max_threads = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    counts = []
+    threads = 1
+    while threads < max_threads:
+        counts.append(threads)
+        threads *= 2
+    return counts + [max_threads]
+
+def run_threads(func: typing.Callable, args: tuple, threads: int, calls_per_thread: int, per_thread_args: bool = False) -> ThreadScalingResult:
+    """
+    Calls :func: :calls_per_thread: times on each of :threads: threads, which start together at a barrier.
+
+    Args:
+        per_thread_args: If True, each thread gets its own deep copy of :args:; otherwise all threads share :args:.
+    """
+    barrier = threading.Barrier(threads)
+    starts = [0] * threads
+    ends = [0] * threads
+    errors = []
+
+    def worker(index, worker_args):
+        perf_counter_ns = time.perf_counter_ns
+        try:
+            barrier.wait()
+            starts[index] = perf_counter_ns()
+            for _ in range(calls_per_thread):
+                func(*worker_args)
+            ends[index] = perf_counter_ns()
+        except BaseException as e:
+            errors.append(e)
+            barrier.abort()
+
+    workers = [threading.Thread(target=worker, args=(index, copy.deepcopy(args) if per_thread_args else args)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    if len(errors) > 0:
+        raise errors[0]
+
+    return ThreadScalingResult(threads, calls_per_thread, max(ends) - min(starts))
+
+def time_funcs_threads(funcs: tuple[typing.Callable] | typing.Callable, *args, threads: typing.Optional[typing.Sequence[int]] = None, calls_per_thread: typing.Optional[int] = None, repeats: int = 3, per_thread_args: bool = False) -> dict[typing.Callable, list[ThreadScalingResult]]:
+    """
+    Measures throughput of :funcs: on each number of :threads:, and prints a scaling report.
+
+    Args:
+        threads: Numbers of threads. Defaults to thread_counts().
+        calls_per_thread: Number of calls on each thread.
+            Defaults to the number of calls taking AUTORANGE_THREAD_NS on a single thread (see timer.autorange_batch_size()), for each function.
+        repeats: Number of runs for each number of threads; the run of the median throughput is reported.
+        per_thread_args: See run_threads().
+
+    Returns: {func: a list of ThreadScalingResult, in the order of :threads:}
+    """
+    funcs = as_funcs(funcs)
+    threads = sorted(threads) if threads is not None else thread_counts()
+    if any(inspect.iscoroutinefunction(func) for func in funcs):
+        raise TypeError('Coroutine functions cannot be measured on threads; use timer.exec_times() with concurrency instead.')
+
+    results = {}
+    for func in funcs:
+        func_calls = calls_per_thread if calls_per_thread is not None else autorange_batch_size(func, *args, min_batch_ns=AUTORANGE_THREAD_NS)
+        func_results = []
+        for thread_count in threads:
+            runs = [run_threads(func, args, thread_count, func_calls, per_thread_args=per_thread_args) for _ in range(max(repeats, 1))]
+            median_ns = statistics.median_low([run.elapsed_ns for run in runs])
+            func_results.append(next(run for run in runs if run.elapsed_ns == median_ns))
+        results[func] = func_results
+
+    for line in thread_scaling_summary(results):
+        print(line)
+    print()
+
+    return results
+
+def thread_scaling_summary(results: dict[typing.Callable, list[ThreadScalingResult]]) -> list[str]:
+    def name(func):
+        func = func.func if isinstance(func, functools.partial) else func
+        return f'{func.__module__}.{func.__name__}'
+
+    lines = [f'Thread scaling: ({python_implemntation_text()}, {gil_status_text()})']
+    for func, func_results in results.items():
+        baseline = func_results[0]
+        rows = [('threads', 'ops/sec', 'speedup', 'efficiency')]
+        for result in func_results:
+            rows.append((
+                f'{result.threads:,}',
+                f'{result.ops_per_sec:,.1f}',
+                f'x{result.ops_per_sec / baseline.ops_per_sec:,.2f}',
+                f'{result.efficiency(baseline):.2%}',
+            ))
+        column_widths = [max(map(len, column_texts)) for column_texts in zip(*rows)]
+        lines.append(f' - {name(func)} (calls per thread: {func_results[0].calls_per_thread:,})')
+        for row in rows:
+            lines.append('   ' + '  '.join(f'{text:>{width}}' for text, width in zip(row, column_widths)))
+
+    return lines
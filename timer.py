@@ -4,20 +4,47 @@
 """
 from __future__ import annotations
 
+import array
+import asyncio
+import concurrent.futures
+import contextlib
+import copy
 import datetime
+import enum
+import io
+import math
+import multiprocessing
 import time
+import tracemalloc
 import dataclasses
 from collections import namedtuple
 import functools
 import gc
+import inspect
+import itertools
+import sys
+import types
 
 # For type hints
 import typing
 
 import colorama
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
 from strs import colorize, append_lateral_lines
 from lookups import ThresholdMap
+from profiling import FuncProfile, profile_func, PROFILE_MIN_NS
+import human_friendly
+import stats
 
 
 class TimerError(Exception):
@@ -190,16 +217,378 @@ def format_timespan_seconds(timespan, msec_precision=0):
         return days_text + f'{int(timespan_24hr // 3600):02}:{int((timespan_24hr % 3600) // 60):02}:{int(timespan_24hr % 60):02}'
 
 
+class ExecSamples:
+    """
+    Timing samples of a function, stored in compact arrays rather than Python objects.
+
+    Each sample is the elapsed time of a batch of one or more calls; statistics are computed on per-call times of the samples.
+    """
+    def __init__(self):
+        self._elapsed_ns = array.array('q')
+        self._calls = array.array('q')
+        self._gc_ns = array.array('q')
+
+    def add(self, elapsed_ns: int, calls: int = 1, gc_ns: int = 0) -> None:
+        """
+        Args:
+            gc_ns: Time spent on garbage collections within :elapsed_ns:.
+        """
+        self._elapsed_ns.append(elapsed_ns)
+        self._calls.append(calls)
+        self._gc_ns.append(gc_ns)
+
+    def __len__(self):
+        return len(self._elapsed_ns)
+
+    @property
+    def total_ns(self) -> int:
+        return sum(self._elapsed_ns)
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self._calls)
+
+    @property
+    def total_gc_ns(self) -> int:
+        return sum(self._gc_ns)
+
+    @property
+    def elapsed(self) -> MonotonicElapsed:
+        return MonotonicElapsed(self.total_ns)
+
+    def per_call_ns(self, exclude_gc: bool = False) -> list[float]:
+        if exclude_gc:
+            return [(elapsed_ns - gc_ns) / calls for elapsed_ns, calls, gc_ns in zip(self._elapsed_ns, self._calls, self._gc_ns)]
+        return [elapsed_ns / calls for elapsed_ns, calls in zip(self._elapsed_ns, self._calls)]
+
+    def statistic(self, name: str = 'median', exclude_gc: bool = False) -> float:
+        """
+        Returns: Statistic :name: (one of stats.STATISTICS) of per-call times in nanoseconds.
+            'mean' is weighted by number of calls of samples.
+            If :exclude_gc: is True, time spent on garbage collections is subtracted from samples.
+        """
+        if name == 'mean':
+            total_ns = self.total_ns - self.total_gc_ns if exclude_gc else self.total_ns
+            return total_ns / self.total_calls if self.total_calls > 0 else 0.0
+        return stats.statistic(self.per_call_ns(exclude_gc=exclude_gc), name)
+
+    def describe(self) -> dict[str, float]:
+        description = stats.describe(self.per_call_ns())
+        description['mean'] = self.statistic('mean')
+        return description
+
+    def bootstrap_ci(self, name: str = 'median', confidence: float = 0.95, resamples: int = 1000, seed: typing.Optional[int] = 0) -> tuple[float, float]:
+        return stats.bootstrap_ci(self.per_call_ns(), name, confidence=confidence, resamples=resamples, seed=seed)
+
+    def quick_ci(self, name: str = 'median', confidence: float = 0.95) -> tuple[float, float]:
+        """
+        Returns: A confidence interval by stats.quick_ci(); that of 'mean' is weighted by number of calls of samples, same as statistic().
+        """
+        return stats.quick_ci(self.per_call_ns(), name, confidence, weights=self._calls if name == 'mean' else None)
+
+    def relative_ci_width(self, name: str = 'median', confidence: float = 0.95) -> float:
+        """
+        Returns: Width of the confidence interval of statistic :name: by stats.quick_ci(), relative to the statistic; inf if there are too few samples.
+        """
+        lower, upper = self.quick_ci(name, confidence)
+        value = self.statistic(name)
+        if math.isnan(lower) or (value <= 0):
+            return math.inf
+        return (upper - lower) / value
+
+AdaptiveStop = enum.Enum('AdaptiveStop', ['TargetMet', 'BudgetExhausted', 'RepeatsExhausted'])
+
+@dataclasses.dataclass(frozen=True)
+class AdaptivePrecision:
+    """
+    Precision achieved by adaptive sampling of a function, and why sampling stopped.
+
+    - relative_ci_width: Width of the confidence interval of the ranked statistic relative to it. See ExecSamples.relative_ci_width().
+    - target: Target of :relative_ci_width:, or None if sampling was limited by a time budget only.
+    """
+    relative_ci_width: float
+    confidence: float
+    target: typing.Optional[float]
+    stop: AdaptiveStop
+    calls: int
+
+    def text(self):
+        target = f' (target: {self.target:.2%})' if self.target is not None else ''
+        text = f'{self.calls:,} calls, CI{self.confidence:.0%} width: {self.relative_ci_width:.2%}{target}'
+        if (self.target is not None) and (self.stop != AdaptiveStop.TargetMet):
+            text += colorize(' not met: ' + ('time budget exhausted' if self.stop == AdaptiveStop.BudgetExhausted else 'repeats exhausted'), colorama.Fore.YELLOW)
+        return text
+
+    def __str__(self):
+        return self.text()
+
+
+@dataclasses.dataclass(frozen=True)
+class AsyncMeasurement:
+    """
+    Measurement of a coroutine function, awaited :concurrency: times concurrently in each round.
+
+    - concurrency: Number of awaits gathered in each round; samples are per await, i.e. round times divided by it.
+    - overhead_ns: Overhead of awaiting (and gathering) per round, subtracted from samples.
+    - rounds: Number of rounds sampled.
+    - raw_ns: Wall time of the sampled rounds, before the overhead is subtracted.
+    """
+    concurrency: int
+    overhead_ns: float
+    rounds: int = 0
+    raw_ns: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Awaits completed per second over the raw wall time of rounds, since the overhead is part of what awaiting costs.
+        """
+        return self.concurrency * self.rounds * 10**9 / self.raw_ns if self.raw_ns > 0 else math.inf
+
+@dataclasses.dataclass(frozen=True)
+class MemoryUsage:
+    """
+    Memory traced by tracemalloc during a single call of a function, in bytes above the memory traced before the call.
+
+    - peak_bytes: Peak traced memory during the call.
+    - retained_bytes: Traced memory still allocated after the call, including the return value.
+    - retained_blocks: Net number of memory blocks the call left allocated, or None if not counted.
+    """
+    peak_bytes: int
+    retained_bytes: int
+    retained_blocks: typing.Optional[int] = None
+
+    def text(self):
+        blocks = f' in {self.retained_blocks:,} blocks' if self.retained_blocks is not None else ''
+        return f'peak: {human_friendly.binary_size(self.peak_bytes)}, retained: {human_friendly.binary_size(self.retained_bytes)}{blocks}'
+
+    def __str__(self):
+        return self.text()
+
+# getrusage() of the calling thread where available (Linux), otherwise of the process.
+_RUSAGE_WHO = getattr(resource, 'RUSAGE_THREAD', getattr(resource, 'RUSAGE_SELF', None))
+# ru_maxrss is in bytes on macOS, and in kilobytes elsewhere.
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+def _rusage_counters() -> tuple[int, ...]:
+    if resource is None:
+        return (0, 0, 0, 0, 0)
+    usage = resource.getrusage(_RUSAGE_WHO)
+    return (usage.ru_nvcsw, usage.ru_nivcsw, usage.ru_minflt, usage.ru_majflt, usage.ru_maxrss * _MAXRSS_UNIT)
+
+def _resource_snapshot(end: bool = False) -> tuple[int, ...]:
+    """
+    Returns: A tuple of (perf_counter_ns, thread_time_ns, process_time_ns, voluntary context switches, involuntary context switches,
+        minor page faults, major page faults, max RSS in bytes). Counters of getrusage() are 0 where it is not available.
+
+    Clocks are read in the reverse order at the :end: of a span, so that the wall time encloses the CPU time
+    and getrusage() is outside both.
+    """
+    if end:
+        thread_ns, process_ns = time.thread_time_ns(), time.process_time_ns()
+        wall_ns = time.perf_counter_ns()
+        return (wall_ns, thread_ns, process_ns, *_rusage_counters())
+    counters = _rusage_counters()
+    wall_ns = time.perf_counter_ns()
+    return (wall_ns, time.thread_time_ns(), time.process_time_ns(), *counters)
+
+@functools.lru_cache(maxsize=None)
+def _snapshot_gap_ns() -> int:
+    """
+    Returns: The median wall time not counted as CPU time of the thread between two _resource_snapshot()s with nothing in between,
+        i.e. the part of the cost of snapshots which is subtracted from wall times of samples checked for noise.
+    """
+    gaps = []
+    for _ in range(101):
+        before = _resource_snapshot()
+        after = _resource_snapshot(end=True)
+        gaps.append((after[0] - before[0]) - (after[1] - before[1]))
+    return sorted(gaps)[len(gaps) // 2]
+
+@dataclasses.dataclass(frozen=True)
+class ResourceUsage:
+    """
+    CPU time and getrusage() counters over the sampling of a function, read once before and once after all of its samples,
+    so that they include the untimed work between batches (e.g. cache resets and copies of fresh arguments).
+
+    - wall_ns: Wall time of the samples.
+    - thread_cpu_ns, process_cpu_ns: CPU time of the measuring thread and of the process.
+    - voluntary_switches, involuntary_switches: Context switches; involuntary ones mean the thread was preempted.
+    - minor_faults, major_faults: Page faults; major ones needed I/O.
+    - max_rss_bytes: Maximum resident set size of the process (or the thread, where getrusage() counts threads) at the end.
+    - samples: Number of samples.
+    - noisy_samples, discarded_samples: Numbers of noisy samples kept, and of noisy samples discarded and measured again.
+      Samples are checked for noise only with exec_times() discard_noisy; noisy_samples is None otherwise.
+    """
+    wall_ns: int = 0
+    thread_cpu_ns: int = 0
+    process_cpu_ns: int = 0
+    voluntary_switches: int = 0
+    involuntary_switches: int = 0
+    minor_faults: int = 0
+    major_faults: int = 0
+    max_rss_bytes: int = 0
+    samples: int = 0
+    noisy_samples: typing.Optional[int] = None
+    discarded_samples: int = 0
+
+    @classmethod
+    def between(cls, before: tuple[int, ...], after: tuple[int, ...], **sample_counts) -> ResourceUsage:
+        """
+        Returns: Usage between two _resource_snapshot()s, with numbers of samples given by :sample_counts: (see fields).
+        """
+        return cls(*(end - start for start, end in zip(before[:7], after[:7])), after[7], **sample_counts)
+
+    @staticmethod
+    def is_noisy_sample(before: tuple[int, ...], after: tuple[int, ...], min_cpu_ratio: float = 0.9) -> bool:
+        """
+        Returns: Whether a sample between two _resource_snapshot()s is noisy, i.e. the thread was preempted,
+            a major page fault occurred, or the thread ran for less than :min_cpu_ratio: of the wall time, net of the cost of snapshots.
+        """
+        wall_ns = after[0] - before[0] - _snapshot_gap_ns()
+        return (after[4] > before[4]) or (after[6] > before[6]) or ((wall_ns > 0) and (after[1] - before[1] < min_cpu_ratio * wall_ns))
+
+    @property
+    def cpu_ratio(self) -> float:
+        """
+        Ratio of CPU time of the measuring thread to wall time; well below 1.0 means the thread waited, e.g. for the scheduler or I/O.
+        """
+        return self.thread_cpu_ns / self.wall_ns if self.wall_ns > 0 else 1.0
+
+    def text(self):
+        def counts_text(name, counts):
+            counts = [f'{count:,} {kind}' for kind, count in counts if count > 0]
+            return [f'{name}: {" + ".join(counts)}'] if len(counts) > 0 else []
+
+        # Max RSS is of the process rather than of the function, so it is left to machine-readable reports.
+        texts = [f'CPU/wall: {self.cpu_ratio:.1%}']
+        texts.extend(counts_text('context switches', (('voluntary', self.voluntary_switches), ('involuntary', self.involuntary_switches))))
+        texts.extend(counts_text('page faults', (('minor', self.minor_faults), ('major', self.major_faults))))
+        if self.noisy_samples:
+            texts.append(colorize(f'noisy samples: {self.noisy_samples:,}/{self.samples:,}', colorama.Fore.YELLOW))
+        if self.discarded_samples > 0:
+            texts.append(f'discarded: {self.discarded_samples:,} noisy samples')
+        return ', '.join(texts)
+
+    def __str__(self):
+        return self.text()
+
+def measure_memory(func, *args, count_blocks: bool = False) -> MemoryUsage:
+    """
+    Measures memory allocated by a single call of :func: with tracemalloc. See MemoryUsage.
+
+    Tracing is started and stopped around the call unless it is already running.
+
+    Args:
+        count_blocks: If True, retained blocks are counted from snapshots of all traces taken before and after the call,
+            which costs time and memory in proportion to the number of traced blocks.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        before_snapshot = tracemalloc.take_snapshot() if count_blocks else None
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func_return = func(*args)
+        current, peak = tracemalloc.get_traced_memory()
+        after_snapshot = tracemalloc.take_snapshot() if count_blocks else None
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    del func_return
+
+    blocks = None
+    if count_blocks:
+        # Exclude allocations by tracemalloc itself, e.g. of before_snapshot.
+        exclude_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        blocks = sum(stat.count_diff for stat in after_snapshot.filter_traces(exclude_tracemalloc).compare_to(before_snapshot.filter_traces(exclude_tracemalloc), 'filename'))
+    return MemoryUsage(peak - before, current - before, blocks)
+
+
 class ExecTimes:
     # if ExecTimes.__BULLET__ is not None, it is prepended before each line of summary.
     __BULLET__ = '-'
+    # Attributes holding per-function records, keyed by function.
+    __FUNC_RECORDS__ = ('_times', '_samples', '_batch_sizes', '_cache_reset_ns', '_gc_collections', '_warmups', '_memory', '_async', '_profiles', '_resources', '_precision')
+
+    def __init__(self, repeats=1, rank_by='median'):
+        """
+        Args:
+            rank_by: Statistic of per-call times (one of stats.STATISTICS) which functions are ranked and compared on.
+        """
+        if rank_by not in stats.STATISTICS:
+            raise ValueError(f'Invalid statistic: {rank_by}; must be among {list(stats.STATISTICS)}')
 
-    def __init__(self, repeats=1):
         self._times = {}
+        self._samples = {}
+        self._batch_sizes = {}
+        self._cache_reset_ns = {}
+        self._gc_collections = {}
+        self._warmups = {}
+        self._memory = {}
+        self._async = {}
+        self._profiles = {}
+        self._resources = {}
+        self._precision = {}
         self._repeats = repeats
+        self._rank_by = rank_by
+
+    def add_exec_time(self, func, func_return, exec_time, batch_size=1, samples: typing.Optional[ExecSamples] = None, cache_reset_ns: int = 0, gc_collections: int = 0, warmup: typing.Optional[tuple[int, bool]] = None, memory: typing.Optional[MemoryUsage] = None, async_measurement: typing.Optional[AsyncMeasurement] = None, profile: typing.Optional[FuncProfile] = None, resources: typing.Optional[ResourceUsage] = None, precision: typing.Optional[AdaptivePrecision] = None):
+        """
+        Args:
+            exec_time: Accumulated execution time of :repeats: calls of :func:.
+            batch_size: Number of calls timed by a single pair of clock reads.
+            samples: Timing samples of :func:.
+                If None, :exec_time: is recorded as a single sample of :repeats: calls.
+            cache_reset_ns: Time spent on resetting caches between batches, outside the timed region.
+            gc_collections: Number of garbage collections within the timed region.
+            warmup: A tuple of (number of warmup calls, whether timings converged), or None if :func: was not warmed up.
+            memory: Memory usage of a call of :func:, measured separately from timing, or None if not measured.
+            async_measurement: For a coroutine function, its concurrency, overhead and raw round times; otherwise None.
+            profile: Hot-spot profile of :func:, collected separately from timing, or None if not profiled.
+            resources: CPU time and getrusage() counters accumulated over the samples, or None if not accounted.
+            precision: Precision achieved by adaptive sampling, or None if :func: was sampled for a fixed number of calls.
+        """
+        if samples is None:
+            samples = ExecSamples()
+            samples.add(exec_time.monotonic_elapsed_ns, max(self._repeats, 1))
 
-    def add_exec_time(self, func, func_return, exec_time):
         self._times[func] = (func_return, exec_time)
+        self._samples[func] = samples
+        self._batch_sizes[func] = batch_size
+        self._cache_reset_ns[func] = cache_reset_ns
+        self._gc_collections[func] = gc_collections
+        self._warmups[func] = warmup
+        self._memory[func] = memory
+        self._async[func] = async_measurement
+        self._profiles[func] = profile
+        self._resources[func] = resources
+        self._precision[func] = precision
+
+    def merge(self, other: ExecTimes) -> None:
+        """
+        Adds records of functions measured by :other: (e.g. in another process) to this.
+        Functions are appended in the order of :other:; records of functions measured by both are replaced.
+        """
+        for records in ExecTimes.__FUNC_RECORDS__:
+            getattr(self, records).update(getattr(other, records))
+
+    def samples(self, func) -> ExecSamples:
+        return self._samples[func]
+
+    def statistic(self, func, name: typing.Optional[str] = None) -> float:
+        """
+        Returns: Statistic :name: of per-call times of :func: in nanoseconds.
+            If :name: is None, the statistic functions are ranked on is used.
+        """
+        return self._samples[func].statistic(name if name is not None else self._rank_by)
+
+    def per_call_exec_time(self, func) -> float:
+        """
+        Returns: Average execution time of a single call of :func: in seconds.
+        """
+        return self.statistic(func, 'mean') / 10**9
 
     @property
     def bullet(self):
@@ -207,18 +596,39 @@ class ExecTimes:
     
     @property
     def exec_times_sorted_funcs(self):
-        return [func for func, _ in sorted(self._times.items(), key=lambda t: t[1][1])]
+        return sorted(self._times.keys(), key=self.statistic)
     
     @property
     def comparison_matrix(self):
         """
         speed = 1 / t
         ratio = speed - speed_ref = (1 / t) / (1 / t_ref) = t_ref / t
+
+        t is the statistic functions are ranked on.
+        """
+        exec_times = [self.statistic(func) for func in self.exec_times_sorted_funcs]
+        return [[exec_times[col] / exec_times[row] if exec_times[row] > 0 else float('inf') for col in range(len(exec_times))] for row in range(len(exec_times))]
+
+    @property
+    def memory_measured(self) -> bool:
+        return (len(self._memory) > 0) and all(memory is not None for memory in self._memory.values())
+
+    @property
+    def memory_comparison_matrix(self):
+        """
+        ratio = m_ref / m, where m is the peak memory; in the order of exec_times_sorted_funcs.
         """
-        exec_times = [self._times[func][1] for func in self.exec_times_sorted_funcs]
-        return [[exec_times[col] / exec_times[row] for col in range(len(exec_times))] for row in range(len(exec_times))]
+        peaks = [max(self._memory[func].peak_bytes, 1) for func in self.exec_times_sorted_funcs]
+        return [[peaks[col] / peaks[row] for col in range(len(peaks))] for row in range(len(peaks))]
 
-    def formatted_comparison_matrix(self, self_symbol: tuple[str, str] = ('-', colorama.Fore.RESET), best_symbol: tuple[str, str] = ('+++', colorama.Fore.RESET), worst_symbol: tuple[str, str] = ('---', colorama.Fore.RESET), column_interspaces: int = 1):
+    def formatted_comparison_matrix(self, self_symbol: tuple[str, str] = ('-', colorama.Fore.RESET), best_symbol: tuple[str, str] = ('+++', colorama.Fore.RESET), worst_symbol: tuple[str, str] = ('---', colorama.Fore.RESET), column_interspaces: int = 1, matrix: typing.Optional[list[list[float]]] = None, best_index: int = 0, worst_index: int = -1):
+        """
+        Args:
+            matrix: A comparison matrix to format. If None, comparison_matrix is used.
+            best_index, worst_index: Indices of the best and the worst rows, of which diagonal elements are replaced with :best_symbol: and :worst_symbol:.
+                comparison_matrix is sorted in ascending order of execution time, so the first row is the best and the last row is the worst.
+                Neither is marked if they are the same row or all values are equal, as there is no best or worst.
+        """
         VALUE_COLORS = {
             # Defines lower bound for text color.
             2.0: colorama.Fore.LIGHTCYAN_EX,
@@ -242,11 +652,13 @@ class ExecTimes:
             return text_with_color
         
         text_color = ThresholdMap(VALUE_COLORS, threshold_type=ThresholdMap.Boundary.LowerBound)
-        mat = [[format_value(value) if i != j else self_symbol for j, value in enumerate(row)] for i, row in enumerate(self.comparison_matrix)]
+        matrix = self.comparison_matrix if matrix is None else matrix
+        mat = [[format_value(value) if i != j else self_symbol for j, value in enumerate(row)] for i, row in enumerate(matrix)]
 
-        # Comparison matrix is already sorted in ascending order of execution time.
-        mat[0][0] = best_symbol
-        mat[len(mat) - 1][len(mat[0]) - 1] = worst_symbol
+        differs = any(value != 1.0 for i, row in enumerate(matrix) for j, value in enumerate(row) if i != j)
+        if differs and (best_index % len(mat) != worst_index % len(mat)):
+            mat[best_index][best_index] = best_symbol
+            mat[worst_index][worst_index] = worst_symbol
         column_widths = [max(map(lambda t: len(t[0]), column_texts)) for column_texts in zip(*mat)]
         for row in mat:
             for col, (text, color) in enumerate(row):
@@ -255,7 +667,37 @@ class ExecTimes:
 
         return [(' ' * column_interspaces).join(row) for row in mat]
     
-    def summary(self, test_results: dict[typing.Callable, str]):
+    def distribution_lines(self, confidence: typing.Optional[float] = 0.95, bootstrap_resamples: typing.Optional[int] = None) -> list[str]:
+        """
+        Returns: Lines of a table of per-call time statistics of functions, in the order of exec_times_sorted_funcs.
+            If :confidence: is not None, a confidence interval of the ranking statistic is appended:
+            by stats.quick_ci() (order statistics for quantiles), or a bootstrap interval of :bootstrap_resamples: resamples if given.
+        """
+        header = ['', *stats.STATISTICS]
+        if confidence is not None:
+            header.append(f'CI{confidence:.0%} ({self._rank_by})')
+
+        rows = [header]
+        for func in self.exec_times_sorted_funcs:
+            samples = self._samples[func]
+            description = samples.describe()
+            row = [getattr(func, '__name__', str(func)), *(human_friendly.seconds(description[name] / 10**9, decimal_precision=4) for name in stats.STATISTICS)]
+            if confidence is not None:
+                if bootstrap_resamples is not None:
+                    lower, upper = samples.bootstrap_ci(self._rank_by, confidence=confidence, resamples=bootstrap_resamples)
+                else:
+                    lower, upper = samples.quick_ci(self._rank_by, confidence=confidence)
+                row.append(f'[{human_friendly.seconds(lower / 10**9, decimal_precision=4)}, {human_friendly.seconds(upper / 10**9, decimal_precision=4)}]')
+            rows.append(row)
+
+        column_widths = [max(map(len, column_texts)) for column_texts in zip(*rows)]
+        lines = [f'Per-call time distribution: (samples: {", ".join(f"{len(self._samples[func]):,}" for func in self.exec_times_sorted_funcs)})']
+        for row in rows:
+            lines.append(self.bullet + f'{row[0]:{column_widths[0]}}  ' + '  '.join(f'{text:>{width}}' for text, width in zip(row[1:], column_widths[1:])))
+
+        return lines
+
+    def summary(self, test_results: dict[typing.Callable, str], confidence: typing.Optional[float] = 0.95, bootstrap_resamples: typing.Optional[int] = None):
         def get_func(func):
             if isinstance(func, functools.partial):
                 return func.func
@@ -266,14 +708,55 @@ class ExecTimes:
         max_func_name_length = max(map(lambda f: len(get_func(f).__name__), self._times.keys()))
         max_func_desc_length = max(map(lambda f: len(getattr(f, '__description__', '')), self._times.keys()))
         
-        lines = [f'Execution times: (iterations: {self._repeats:,})']
+        iterations = f'adaptive, up to {self._repeats:,}' if any(precision is not None for precision in self._precision.values()) else f'{self._repeats:,}'
+        lines = [f'Execution times: (iterations: {iterations}, ranked by: {self._rank_by}, GC included)']
         for func in self.exec_times_sorted_funcs:
             exec_time = self._times[func][1]
             desc = ''
             if max_func_desc_length > 0:
                 desc = f'[{getattr(func, "__description__", ""):{max_func_desc_length}}] '
+            async_measurement = self._async.get(func)
+            # Samples of coroutine functions awaited concurrently are per await, comparable to per-call times of others.
+            unit = 'await' if (async_measurement is not None) and (async_measurement.concurrency > 1) else 'call'
+            details = [f'{self._rank_by} {human_friendly.seconds(self.statistic(func) / 10**9, decimal_precision=4)}/{unit}']
+            precision = self._precision.get(func)
+            if precision is not None:
+                details.append(f'adaptive: {precision.text()}')
+            batch_size = self._batch_sizes.get(func, 1)
+            if batch_size > 1:
+                details.append(f'batch: {batch_size:,}')
+            cache_reset_ns = self._cache_reset_ns.get(func, 0)
+            if cache_reset_ns > 0:
+                details.append(f'cache reset: {human_friendly.seconds(cache_reset_ns / 10**9, decimal_precision=4)}')
+            warmup = self._warmups.get(func)
+            if warmup is not None:
+                warmup_calls, converged = warmup
+                details.append(f'warmup: {warmup_calls:,} calls' + ('' if converged else colorize(' (not converged)', colorama.Fore.RED)))
+            if async_measurement is not None:
+                concurrency = async_measurement.concurrency
+                overhead = human_friendly.seconds(async_measurement.overhead_ns / 10**9, decimal_precision=4)
+                if concurrency > 1:
+                    round_time = human_friendly.seconds(self.statistic(func) * concurrency / 10**9, decimal_precision=4)
+                    details.append(f'concurrency: {concurrency:,}, {self._rank_by} {round_time}/round, throughput: {async_measurement.throughput:,.1f} awaits/s')
+                    details.append(f'async overhead: {overhead}/round subtracted')
+                else:
+                    details.append(f'async overhead: {overhead}/call subtracted')
+            memory = self._memory.get(func)
+            if memory is not None:
+                details.append(memory.text())
+            resources = self._resources.get(func)
+            if resources is not None:
+                details.append(resources.text())
+            gc_collections = self._gc_collections.get(func, 0)
+            if gc_collections > 0:
+                samples = self._samples[func]
+                gc_time = human_friendly.seconds(samples.total_gc_ns / 10**9, decimal_precision=4)
+                excluded = human_friendly.seconds(samples.statistic(self._rank_by, exclude_gc=True) / 10**9, decimal_precision=4)
+                details.append(f'GC: {gc_collections:,} collections in {gc_time}')
+                details.append(f'GC excluded: {self._rank_by} {excluded}/call')
+            test_result = test_results[func]
             func = get_func(func)
-            lines.append(f'{self.bullet}{desc}{func.__module__:>{max_module_name_length}}.{func.__name__:{max_func_name_length}}: [{test_results[func]}] {exec_time}')
+            lines.append(f'{self.bullet}{desc}{func.__module__:>{max_module_name_length}}.{func.__name__:{max_func_name_length}}: [{test_result}] {exec_time} ({", ".join(details)})')
 
         best_symbol = ('Best', colorama.Fore.YELLOW)
         worst_symbol = ('Worst', colorama.Fore.BLACK)
@@ -283,31 +766,512 @@ class ExecTimes:
             'r_i,j = v_i / v_j = t_j / t_i',
         ]
         lines = append_lateral_lines(lines, 0, speed_ratio_lines)
+        if self.memory_measured:
+            peaks = [self._memory[func].peak_bytes for func in self.exec_times_sorted_funcs]
+            memory_ratio_lines = [
+                'Cross-relative memory ratio (peak)',
+                *self.formatted_comparison_matrix(best_symbol=best_symbol, worst_symbol=worst_symbol, matrix=self.memory_comparison_matrix, best_index=peaks.index(min(peaks)), worst_index=peaks.index(max(peaks))),
+                'r_i,j = m_j / m_i',
+            ]
+            lines = append_lateral_lines(lines, 0, memory_ratio_lines)
+        not_converged = [get_func(func).__name__ for func in self.exec_times_sorted_funcs if (self._warmups.get(func) is not None) and not self._warmups[func][1]]
+        if len(not_converged) > 0:
+            lines.append(colorize(f'Warmup did not converge: {", ".join(not_converged)}', colorama.Fore.RED))
+        lines.extend(self.distribution_lines(confidence=confidence, bootstrap_resamples=bootstrap_resamples))
+        for func in self.exec_times_sorted_funcs:
+            if self._profiles.get(func) is not None:
+                lines.extend(self._profiles[func].report_lines())
 
         return lines
 
-    def print_summary(self, test_results: dict[typing.Callable, str]):
-        for line in self.summary(test_results):
+    def print_summary(self, test_results: dict[typing.Callable, str], **summary_options):
+        for line in self.summary(test_results, **summary_options):
             print(line)
 
-def exec_times(funcs, *args, repeats=1):
-    times = ExecTimes(repeats)
+GCMode = enum.Enum('GCMode', ['Enabled', 'Disabled', 'Frozen'])
+
+class GCTracker:
+    """
+    Accumulates the number and duration of garbage collections reported by gc.callbacks while :tracking: is True.
+
+    Usage:
+        with GCTracker() as tracker:
+            tracker.tracking = True
+            ...
+            tracker.tracking = False
+    """
+    def __init__(self):
+        self.tracking = False
+        self.collections = 0
+        self.elapsed_ns = 0
+        self._start = None
+
+    def _callback(self, phase: str, info: dict) -> None:
+        if not self.tracking:
+            return
+        if phase == 'start':
+            self._start = time.perf_counter_ns()
+        elif self._start is not None:
+            self.elapsed_ns += time.perf_counter_ns() - self._start
+            self.collections += 1
+            self._start = None
+
+    def __enter__(self):
+        gc.callbacks.append(self._callback)
+        return self
+
+    def __exit__(self, *exc_info):
+        gc.callbacks.remove(self._callback)
+
+@contextlib.contextmanager
+def gc_controlled(gc_mode: GCMode):
+    """
+    Controls the garbage collector while measuring a function, and restores its state afterwards.
+
+    - GCMode.Enabled: The collector is left as is.
+    - GCMode.Disabled: The collector is disabled.
+    - GCMode.Frozen: All objects alive are moved to the permanent generation with gc.freeze(), so that collections only scan objects created while measuring.
+    """
+    if gc_mode == GCMode.Enabled:
+        yield
+        return
+
+    was_enabled = gc.isenabled()
+    gc.collect()
+    if gc_mode == GCMode.Disabled:
+        gc.disable()
+    elif gc_mode == GCMode.Frozen:
+        gc.freeze()
+    else:
+        raise ValueError(f'Invalid GC mode: {gc_mode}; must be among {[str(v) for v in GCMode]}')
+
+    try:
+        yield
+    finally:
+        if gc_mode == GCMode.Frozen:
+            gc.unfreeze()
+        if was_enabled:
+            gc.enable()
+        gc.collect()
+
+def collect_young_garbage() -> None:
+    """
+    Collects the young generations if the collector would have done so, i.e. if allocations exceeded the threshold of generation 0.
+    Called between batches, outside the timed region.
+    """
+    if gc.get_count()[0] >= gc.get_threshold()[0]:
+        gc.collect(1)
+
+class CacheResetRegistry:
+    """
+    Registry of callables which reset caches before each timed batch, so that repeated runs are measured from a cold cache.
+
+    Caches of functools.lru_cache/functools.cache wrappers defined at the top level of a module (or in its classes)
+    are registered automatically, by scanning the module of each measured function once.
+    Other caches (e.g. wrappers defined inside functions, or dictionaries used as memos) must be registered with register().
+    """
+    def __init__(self, auto_register: bool = True):
+        """
+        Args:
+            auto_register: If False, only caches registered explicitly are reset.
+        """
+        self._resets = {}
+        self._scanned_modules = set()
+        self.auto_register = auto_register
+
+    def __len__(self):
+        return len(self._resets)
+
+    def register(self, reset: typing.Callable[[], typing.Any]) -> typing.Callable[[], typing.Any]:
+        """
+        Registers :reset:, a callable without arguments. Returns :reset:, so this can be used as a decorator.
+        """
+        self._resets[reset] = reset
+        return reset
+
+    def unregister(self, reset: typing.Callable[[], typing.Any]) -> None:
+        self._resets.pop(reset, None)
+
+    def register_cache(self, cached_func: functools._lru_cache_wrapper) -> functools._lru_cache_wrapper:
+        """
+        Registers cache_clear() of :cached_func:. Returns :cached_func:, so this can be used as a decorator.
+        """
+        self._resets[cached_func] = cached_func.cache_clear
+        return cached_func
+
+    def register_module(self, module: types.ModuleType) -> None:
+        """
+        Registers caches defined at the top level of :module: or in its classes. Each module is scanned only once.
+        """
+        if module.__name__ in self._scanned_modules:
+            return
+        self._scanned_modules.add(module.__name__)
+
+        for obj in list(vars(module).values()):
+            if isinstance(obj, functools._lru_cache_wrapper):
+                self.register_cache(obj)
+            elif isinstance(obj, type) and obj.__module__ == module.__name__:
+                for attr in vars(obj).values():
+                    if isinstance(attr, functools._lru_cache_wrapper):
+                        self.register_cache(attr)
+
+    def prepare(self, func: typing.Callable) -> None:
+        """
+        Registers caches of the module of :func:, if auto registration is enabled.
+        """
+        if self.auto_register:
+            module = sys.modules.get(getattr(func.func if isinstance(func, functools.partial) else func, '__module__', None))
+            if module is not None:
+                self.register_module(module)
+
+    def reset(self) -> None:
+        for reset in self._resets.values():
+            reset()
+
+# Registry used by exec_times() by default.
+cache_reset_registry = CacheResetRegistry()
+
+# Minimum duration of a single timed batch when the batch size is chosen automatically.
+# perf_counter_ns() and the timer bookkeeping cost in the order of 100 ns, so a 200 us batch keeps their share below 0.1%.
+AUTORANGE_MIN_BATCH_NS = 200_000
+
+# Minimum number of samples before the precision of adaptive sampling is first checked,
+# and the factor by which samples grow between checks, so that checks cost O(n log n) in total.
+ADAPTIVE_MIN_SAMPLES = 20
+ADAPTIVE_CHECK_GROWTH = 1.25
+
+def _batch_call_args(args: tuple, args_factory: typing.Optional[typing.Callable[[], tuple]], batch_size: int) -> typing.Iterable[tuple]:
+    """
+    Returns: Arguments of each call of a batch: :args: repeated, or fresh ones made by :args_factory: before the batch is timed.
+    """
+    if args_factory is None:
+        return itertools.repeat(args, batch_size)
+    return [args_factory() for _ in itertools.repeat(None, batch_size)]
+
+def autorange_batch_size(func, *args, max_batch_size=sys.maxsize, min_batch_ns=AUTORANGE_MIN_BATCH_NS, args_factory: typing.Optional[typing.Callable[[], tuple]] = None):
+    """
+    Finds the number of calls of :func: to be timed by a single pair of clock reads, like timeit.Timer.autorange().
+
+    Batch sizes 1, 2, 5, 10, 20, 50, ... are tried in turn until a batch takes at least :min_batch_ns: nanoseconds.
+    The calibration calls are not timed.
+
+    Args:
+        args_factory: If given, every call gets arguments made by it instead of :args:, for functions which modify their arguments in place.
+            Arguments for a batch are made before the batch is timed.
+
+    Returns: A batch size in [1, :max_batch_size:].
+    """
+    for magnitude in itertools.count():
+        for multiple in (1, 2, 5):
+            batch_size = min(multiple * 10**magnitude, max_batch_size)
+            batch_args = _batch_call_args(args, args_factory, batch_size)
+            start = time.perf_counter_ns()
+            for call_args in batch_args:
+                func(*call_args)
+            if (time.perf_counter_ns() - start >= min_batch_ns) or (batch_size >= max_batch_size):
+                return batch_size
+
+def _exec_times_isolated(func, args, exec_times_options) -> tuple[ExecTimes, typing.Optional[str]]:
+    """
+    Measures :func: in a child process, without printing progress messages.
+
+    Returns: A tuple of (ExecTimes, description of :func: set while running, if any).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = exec_times((func,), *args, **{**exec_times_options, 'progress': False})
+    return times, getattr(func, '__description__', None)
+
+def warmup(func, *args, tolerance=0.05, max_calls=10_000, window=3, min_batch_ns=AUTORANGE_MIN_BATCH_NS, args_factory: typing.Optional[typing.Callable[[], tuple]] = None) -> tuple[int, bool]:
+    """
+    Calls :func: until its timings reach a steady state, e.g. after adaptive specialization of bytecode (CPython 3.11+).
+
+    Batch size is doubled until a batch takes at least :min_batch_ns: nanoseconds.
+    Then batches are run until per-call times of :window: successive batches are within :tolerance: (relative to the fastest of them),
+    or :max_calls: calls are made.
+
+    Args:
+        args_factory: See autorange_batch_size().
+
+    Returns: A tuple of (number of calls made, whether timings converged).
+    """
+    perf_counter_ns = time.perf_counter_ns
+    calls = 0
+    batch_size = 1
+    per_call_times = []
+    while calls < max_calls:
+        batch_size = min(batch_size, max_calls - calls)
+        batch_args = _batch_call_args(args, args_factory, batch_size)
+        start = perf_counter_ns()
+        for call_args in batch_args:
+            func(*call_args)
+        elapsed_ns = perf_counter_ns() - start
+        calls += batch_size
+
+        if elapsed_ns < min_batch_ns:
+            batch_size *= 2
+            per_call_times.clear()
+            continue
+
+        per_call_times.append(elapsed_ns / batch_size)
+        recent = per_call_times[-window:]
+        if (len(recent) == window) and (max(recent) - min(recent) <= tolerance * min(recent)):
+            return calls, True
+
+    return calls, False
+
+_event_loop = None
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns: The event loop reused for running coroutine functions, created on the first call; a uvloop loop if uvloop is installed.
+    """
+    global _event_loop
+    if (_event_loop is None) or _event_loop.is_closed():
+        _event_loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    return _event_loop
+
+def call_func(func, *args):
+    """
+    Calls :func:, or runs it to completion on event_loop() if it is a coroutine function.
+    """
+    if inspect.iscoroutinefunction(func):
+        return event_loop().run_until_complete(func(*args))
+    return func(*args)
+
+async def _timed_awaits(func, args, calls, concurrency=1, call_args=None) -> tuple[int, typing.Any]:
+    """
+    Awaits :func: :calls: times, or :calls: rounds of :concurrency: concurrent awaits gathered, within a single run of the event loop,
+    so that starting and stopping the loop is not timed.
+
+    Args:
+        call_args: If given, a list of arguments for each await (:calls: * :concurrency: of them), instead of :args:.
+
+    Returns: A tuple of (elapsed nanoseconds, return of the last await).
+    """
+    perf_counter_ns = time.perf_counter_ns
+    if call_args is None:
+        call_args = itertools.repeat(args, calls * concurrency)
+    if concurrency == 1:
+        start = perf_counter_ns()
+        for await_args in call_args:
+            func_return = await func(*await_args)
+        end = perf_counter_ns()
+    else:
+        call_args = iter(call_args)
+        gather = asyncio.gather
+        start = perf_counter_ns()
+        for _ in itertools.repeat(None, calls):
+            func_returns = await gather(*[func(*await_args) for await_args in itertools.islice(call_args, concurrency)])
+        end = perf_counter_ns()
+        func_return = func_returns[-1]
+    return end - start, func_return
+
+async def _noop(*args):
+    return None
+
+def async_overhead_ns(args=(), batch_size=1, concurrency=1, batches=20) -> float:
+    """
+    Measures the overhead of awaiting (and with :concurrency: > 1, gathering) a coroutine function in _timed_awaits(), with a coroutine function doing nothing.
+
+    Returns: Median per-call overhead in nanoseconds over :batches: batches of :batch_size: calls.
+    """
+    loop = event_loop()
+    per_call_ns = [loop.run_until_complete(_timed_awaits(_noop, args, batch_size, concurrency))[0] / batch_size for _ in range(batches)]
+    return stats.statistic(per_call_ns, 'median')
+
+def exec_times(funcs, *args, repeats=1, batch_size=1, rank_by='median', isolate=False, caches: typing.Optional[CacheResetRegistry] = cache_reset_registry, gc_mode: GCMode = GCMode.Enabled, warmup_tolerance: typing.Optional[float] = None, warmup_max_calls: int = 10_000, fresh_args: bool = False, memory: bool = False, memory_blocks: bool = False, concurrency: int = 1, profile: bool = False, discard_noisy: bool = False, min_cpu_ratio: float = 0.9, target_precision: typing.Optional[float] = None, time_budget: typing.Optional[float] = None, precision_confidence: float = 0.95, progress: bool = True):
+    """
+    Args:
+        repeats: Number of calls of each function.
+            For coroutine functions with :concurrency: > 1, number of rounds of concurrent awaits.
+        batch_size: Number of calls timed by a single pair of clock reads.
+            If None, batch size is chosen by autorange_batch_size() for each function.
+            A timing sample is recorded for each batch.
+        rank_by: Statistic of per-call times which functions are ranked on. See ExecTimes.
+        isolate: If True, each function is measured in a fresh interpreter started by the 'spawn' method,
+            so that state left by functions measured earlier (allocator, caches, specialized bytecode) does not affect it.
+            :funcs: and :args: are pickled to the child, and samples and return values are pickled back.
+            Functions must be importable by the child; functions defined in __main__ require an `if __name__ == '__main__':` guard.
+        caches: A registry of caches to be reset before each batch. If None, caches are not reset.
+            The time spent on resetting caches is not timed, and is reported separately.
+            With :isolate:, the child uses its own default registry unless a (picklable) registry other than the default is given.
+        gc_mode: Controls the garbage collector while measuring each function. See gc_controlled().
+            With GCMode.Disabled and GCMode.Frozen, young generations are collected between batches, outside the timed region.
+            In all modes, number and duration of collections within timed regions are recorded, so that times are reported both with and without GC.
+        warmup_tolerance: If given, each function is warmed up by untimed calls until its batch timings are stable within this relative tolerance,
+            up to :warmup_max_calls: calls. See warmup().
+        fresh_args: If True, every call gets its own deep copy of :args:, for functions which modify their arguments in place.
+            Copies for a batch are made before the batch, outside the timed region, so copy cost is not measured.
+            Warmup and automatic batch sizing also give every call its own copy, so they run on the same input as timed calls and :args: itself is never modified.
+        memory: If True, memory usage of a call of each function is measured with tracemalloc in a separate pass after timing,
+            so that tracing does not distort timings. See measure_memory().
+        memory_blocks: If True, retained memory blocks are counted as well, from tracemalloc snapshots. See measure_memory() count_blocks.
+        concurrency: Number of awaits of a coroutine function gathered concurrently in each call (round), to measure throughput as well as latency.
+            Samples are then per await (round times divided by :concurrency:), so that they rank with per-call times of other functions,
+            while throughput is computed from raw round times. See AsyncMeasurement. Ignored for other functions.
+        profile: If True, each function is profiled in a separate pass after timing, and hot spots of its source lines and callees are reported
+            under the summary. See profiling.profile_func().
+        discard_noisy: If True, each sample is checked for noise (see ResourceUsage.is_noisy_sample()), at the cost of two getrusage() calls per sample,
+            and noisy samples are discarded and their batches measured again, up to :repeats: discarded calls for each function, after which noisy samples are kept.
+            Samples of coroutine functions waiting for I/O use little CPU and are always noisy; do not discard them.
+        min_cpu_ratio: Minimum ratio of CPU time to wall time of a sample not to be noisy.
+        target_precision: If given, sampling of each function stops once the confidence interval of the :rank_by: statistic
+            is narrower than this fraction of it (e.g. 0.01 for 1%), checked as samples grow by ADAPTIVE_CHECK_GROWTH. See ExecSamples.relative_ci_width().
+        time_budget: If given, sampling of each function stops once this many seconds of wall time are spent on it, counted from the start of
+            its warmup and automatic batch sizing; at least one sample is always taken. The profile pass is then limited to the rest of the budget,
+            while the memory pass (a single call) is not limited.
+            With :target_precision: and/or :time_budget:, :repeats: is the maximum number of calls,
+            and the achieved precision is reported in the summary. See AdaptivePrecision.
+        precision_confidence: Confidence level of the interval of :target_precision:.
+        progress: If True, a progress message is printed (and erased) while each function is measured.
+
+    CPU time, context switches, page faults and max RSS are read before and after the samples of each function, and reported in the summary.
+    See ResourceUsage.
+
+    Coroutine functions are awaited on event_loop(), which is reused for all calls; each batch is timed within a single run of the loop.
+    The overhead of awaiting (and gathering) is measured with a coroutine function doing nothing, and subtracted from the samples. See async_overhead_ns().
+    Returns of coroutine functions are the awaited results.
+
+    Note:
+    - Caches are reset before each batch; calls within a batch may hit the cache.
+      Use batch_size=1 to measure cached functions from a cold cache on every call.
+    """
+    times = ExecTimes(repeats, rank_by=rank_by)
+    perf_counter_ns = time.perf_counter_ns
+    adaptive = (target_precision is not None) or (time_budget is not None)
 
     for func in funcs:
-        lru_cached_funcs = [obj for obj in gc.get_objects() if isinstance(obj, functools._lru_cache_wrapper)]
+        if isolate:
+            message = f'Measuring {func.__module__}.{func.__name__} in a child process ...'
+            if progress:
+                print(message, end='')
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                options = dict(repeats=repeats, batch_size=batch_size, rank_by=rank_by, gc_mode=gc_mode, warmup_tolerance=warmup_tolerance, warmup_max_calls=warmup_max_calls, fresh_args=fresh_args, memory=memory, memory_blocks=memory_blocks, concurrency=concurrency, profile=profile, discard_noisy=discard_noisy, min_cpu_ratio=min_cpu_ratio, target_precision=target_precision, time_budget=time_budget, precision_confidence=precision_confidence)
+                if caches is not cache_reset_registry:
+                    options['caches'] = caches
+                func_times, description = executor.submit(_exec_times_isolated, func, args, options).result()
+            if description is not None:
+                for child_func in func_times._times:
+                    child_func.__description__ = description
+            if progress:
+                print('\r' + ' ' * len(message) + '\r', end='')
+            times.merge(func_times)
+            continue
+
+        if caches is not None:
+            caches.prepare(func)
+        reset_caches = caches.reset if (caches is not None) and (len(caches) > 0) else None
+        cache_reset_ns = 0
         message = f'Measuring {func.__module__}.{func.__name__} ...'
-        print(message, end='')
-        timer = MonotonicTimer()
-        for _ in range(repeats):
-            # If there are functions func is wrapped by functools.lru_cache, clear cache to ensure precise measurement for repeated runs.
-            for obj in lru_cached_funcs:
-                obj.cache_clear()
-
-            timer.start()
-            func_return = func(*args)
-            timer.pause()
-
-        print('\r' + ' ' * len(message) + '\r', end='')
-        times.add_exec_time(func, func_return, timer.elapsed)
+        if progress:
+            print(message, end='')
+        samples = ExecSamples()
+        discarded_calls = 0
+        noisy_samples = 0
+        discarded_samples = 0
+        remaining = repeats
+        async_rounds = 0
+        async_raw_ns = 0
+        is_async = inspect.iscoroutinefunction(func)
+        func_concurrency = concurrency if is_async else 1
+        if is_async:
+            loop = event_loop()
+            # A call of a coroutine function to completion, for warmup, batch sizing and memory measurement
+            measured_func = lambda *func_args: loop.run_until_complete(_timed_awaits(func, func_args, 1, func_concurrency))[1]
+        else:
+            measured_func = func
+        budget_start = perf_counter_ns()
+        with gc_controlled(gc_mode), GCTracker() as gc_tracker:
+            # With fresh_args, every calibration call gets its own copy, so that it runs on the same input as timed calls.
+            args_factory = (lambda: copy.deepcopy(args)) if fresh_args else None
+            func_warmup = warmup(measured_func, *args, tolerance=warmup_tolerance, max_calls=warmup_max_calls, args_factory=args_factory) if warmup_tolerance is not None else None
+            func_batch_size = batch_size if batch_size is not None else autorange_batch_size(measured_func, *args, max_batch_size=max(repeats, 1), args_factory=args_factory)
+            overhead_ns = async_overhead_ns(args, func_batch_size, func_concurrency) if is_async else 0
+            next_check = ADAPTIVE_MIN_SAMPLES
+            stop = AdaptiveStop.RepeatsExhausted
+            usage_before = _resource_snapshot()
+            while remaining > 0:
+                calls = min(func_batch_size, remaining)
+                remaining -= calls
+
+                # Reset caches to ensure precise measurement for repeated runs.
+                if reset_caches is not None:
+                    reset_start = perf_counter_ns()
+                    reset_caches()
+                    cache_reset_ns += perf_counter_ns() - reset_start
+                if fresh_args:
+                    batch_args = [copy.deepcopy(args) for _ in itertools.repeat(None, calls * func_concurrency)]
+                    if not is_async:
+                        last_args = batch_args.pop()
+                if gc_mode != GCMode.Enabled:
+                    collect_young_garbage()
+
+                gc_ns = gc_tracker.elapsed_ns
+                if discard_noisy:
+                    sample_before = _resource_snapshot()
+                gc_tracker.tracking = True
+                if is_async:
+                    raw_ns, func_return = loop.run_until_complete(_timed_awaits(func, args, calls, func_concurrency, batch_args if fresh_args else None))
+                    start, end = 0, max(raw_ns - round(overhead_ns * calls), 0)
+                elif fresh_args:
+                    start = perf_counter_ns()
+                    for call_args in batch_args:
+                        func(*call_args)
+                    func_return = func(*last_args)
+                    end = perf_counter_ns()
+                elif calls == 1:
+                    start = perf_counter_ns()
+                    func_return = func(*args)
+                    end = perf_counter_ns()
+                else:
+                    start = perf_counter_ns()
+                    for _ in itertools.repeat(None, calls - 1):
+                        func(*args)
+                    func_return = func(*args)
+                    end = perf_counter_ns()
+                gc_tracker.tracking = False
+                if discard_noisy and ResourceUsage.is_noisy_sample(sample_before, _resource_snapshot(end=True), min_cpu_ratio):
+                    if discarded_calls + calls <= repeats:
+                        discarded_calls += calls
+                        remaining += calls
+                        discarded_samples += 1
+                        continue
+                    noisy_samples += 1
+                samples.add(end - start, calls * func_concurrency, gc_tracker.elapsed_ns - gc_ns)
+                if is_async:
+                    async_rounds += calls
+                    async_raw_ns += raw_ns
+
+                if (time_budget is not None) and (perf_counter_ns() - budget_start >= time_budget * 10**9):
+                    stop = AdaptiveStop.BudgetExhausted
+                    break
+                if (target_precision is not None) and (len(samples) >= next_check):
+                    if samples.relative_ci_width(rank_by, precision_confidence) <= target_precision:
+                        stop = AdaptiveStop.TargetMet
+                        break
+                    next_check = max(next_check + 1, math.ceil(len(samples) * ADAPTIVE_CHECK_GROWTH))
+            func_resources = ResourceUsage.between(usage_before, _resource_snapshot(end=True), samples=len(samples),
+                                                   noisy_samples=noisy_samples if discard_noisy else None, discarded_samples=discarded_samples)
+
+        func_precision = None
+        if adaptive:
+            func_precision = AdaptivePrecision(samples.relative_ci_width(rank_by, precision_confidence), precision_confidence, target_precision, stop, samples.total_calls)
+
+        func_memory = None
+        if memory:
+            if reset_caches is not None:
+                reset_caches()
+            func_memory = measure_memory(measured_func, *(copy.deepcopy(args) if fresh_args else args), count_blocks=memory_blocks)
+
+        func_profile = None
+        if profile:
+            if reset_caches is not None:
+                reset_caches()
+            profile_min_ns = PROFILE_MIN_NS if time_budget is None else min(PROFILE_MIN_NS, max(round(time_budget * 10**9) - (perf_counter_ns() - budget_start), 0))
+            func_profile = profile_func(func, *args, call=measured_func, fresh_args=fresh_args, min_ns=profile_min_ns, max_calls=max(repeats, 1))
+
+        if progress:
+            print('\r' + ' ' * len(message) + '\r', end='')
+        times.add_exec_time(func, func_return, samples.elapsed, batch_size=func_batch_size, samples=samples, cache_reset_ns=cache_reset_ns, gc_collections=gc_tracker.collections, warmup=func_warmup, memory=func_memory, async_measurement=AsyncMeasurement(func_concurrency, overhead_ns, async_rounds, async_raw_ns) if is_async else None, profile=func_profile, resources=func_resources, precision=func_precision)
         
     return times